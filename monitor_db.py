@@ -199,6 +199,22 @@ class StockMonitorDatabase:
         
         return count > 0
     
+    def get_recent_notification_map(self, minutes: int = 60) -> Dict[tuple, str]:
+        """一次查询获取最近X分钟内的通知，返回 {(stock_id, type): 最近触发时间}"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT stock_id, type, MAX(triggered_at) FROM notifications
+            WHERE datetime(triggered_at) > datetime('now', '-' || ? || ' minutes')
+            GROUP BY stock_id, type
+        ''', (minutes,))
+        
+        recent = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+        conn.close()
+        
+        return recent
+    
     def add_notification(self, stock_id: int, notification_type: str, message: str):
         """添加提醒记录"""
         conn = sqlite3.connect(self.db_path)
@@ -73,13 +73,11 @@ def display_monitor_status():
     with col5:
         if monitor_service.running:
             if st.button("⏹️ 停止监测", type="secondary"):
-                monitor_service.stop_monitoring()
-                st.success("✅ 监测服务已停止")
+                st.success(monitor_service.stop_monitoring())
                 st.rerun()
         else:
             if st.button("▶️ 启动监测", type="primary"):
-                monitor_service.start_monitoring()
-                st.success("✅ 监测服务已启动")
+                st.success(monitor_service.start_monitoring())
                 st.rerun()
     
     with col6:
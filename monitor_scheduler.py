@@ -5,10 +5,9 @@
 支持交易日交易时间自动启动关闭监测服务
 """
 
-import schedule
-import time
+import heapq
 import threading
-from datetime import datetime, time as dtime
+from datetime import datetime, timedelta, time as dtime
 from typing import Dict, Optional
 import json
 import os
@@ -20,6 +19,8 @@ class TradingTimeScheduler:
         self.monitor_service = monitor_service
         self.running = False
         self.thread = None
+        self._wake = threading.Event()
+        self._save_lock = threading.Lock()
         self.config = self._load_config()
         
     def _load_config(self) -> Dict:
@@ -59,19 +60,22 @@ class TradingTimeScheduler:
         return default_config
     
     def _save_config(self):
-        """保存调度配置"""
+        """保存调度配置（先写临时文件再原子替换，避免写入中断损坏配置）"""
         config_file = "monitor_schedule_config.json"
+        tmp_file = config_file + ".tmp"
         try:
-            with open(config_file, 'w', encoding='utf-8') as f:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, config_file)
             print(f"✅ 调度配置已保存")
         except Exception as e:
             print(f"❌ 保存调度配置失败: {e}")
     
     def update_config(self, **kwargs):
-        """更新配置"""
-        self.config.update(kwargs)
-        self._save_config()
+        """更新配置并立即保存（加锁，避免并发更新与写盘交错）"""
+        with self._save_lock:
+            self.config.update(kwargs)
+            self._save_config()
     
     def is_trading_day(self) -> bool:
         """判断是否为交易日"""
@@ -140,6 +144,7 @@ class TradingTimeScheduler:
             return
         
         self.running = True
+        self._wake.clear()
         self.thread = threading.Thread(target=self._schedule_loop, daemon=True)
         self.thread.start()
         print("✅ 调度器已启动")
@@ -147,38 +152,56 @@ class TradingTimeScheduler:
     def stop_scheduler(self):
         """停止调度器"""
         self.running = False
-        schedule.clear()
+        self._wake.set()
         if self.thread:
             self.thread.join(timeout=5)
         print("⏹️ 调度器已停止")
     
+    @staticmethod
+    def _next_run_at(time_str: str, now: datetime) -> datetime:
+        """计算某个 HH:MM 时刻下一次到达的时间"""
+        run_time = datetime.strptime(time_str, '%H:%M').time()
+        run_at = datetime.combine(now.date(), run_time)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return run_at
+    
     def _schedule_loop(self):
         """调度循环"""
-        # 清空之前的任务
-        schedule.clear()
-        
-        # 根据市场设置定时任务
+        # 根据市场设置定时任务，按下一次执行时间放入小顶堆
         market = self.config.get('market', 'CN')
         trading_hours = self.config['trading_hours'].get(market, [])
         
+        now = datetime.now()
+        tasks = []
         for period in trading_hours:
             start_time = period['start']
             end_time = period['end']
             
-            # 设置开盘启动任务
-            schedule.every().day.at(start_time).do(self._auto_start_monitoring)
+            # 设置开盘启动任务（序号用于在同一时刻时保持顺序，避免比较函数对象）
+            tasks.append((self._next_run_at(start_time, now), len(tasks), start_time, self._auto_start_monitoring))
             print(f"📅 已设置开盘启动任务: {start_time}")
             
             # 设置收盘停止任务
             if self.config.get('auto_stop', True):
-                schedule.every().day.at(end_time).do(self._auto_stop_monitoring)
+                tasks.append((self._next_run_at(end_time, now), len(tasks), end_time, self._auto_stop_monitoring))
                 print(f"📅 已设置收盘停止任务: {end_time}")
+        heapq.heapify(tasks)
         
-        # 每分钟检查一次是否在交易时间
+        # 每分钟检查一次是否在交易时间，定时任务到点时提前唤醒
         print("🔄 调度器循环已启动")
         while self.running:
             try:
-                schedule.run_pending()
+                now = datetime.now()
+                while tasks and tasks[0][0] <= now:
+                    run_at, seq, time_str, action = heapq.heappop(tasks)
+                    # 先按当前时间排好下一次执行再运行：任务出错不会丢失，
+                    # 休眠/长时间卡顿后也不会把错过的每一天依次补跑
+                    heapq.heappush(tasks, (self._next_run_at(time_str, datetime.now()), seq, time_str, action))
+                    try:
+                        action()
+                    except Exception as e:
+                        print(f"❌ 定时任务 {time_str} 执行失败: {e}")
                 
                 # 智能检测：如果当前在交易时间但服务未运行，则启动
                 if self.is_trading_time() and not self.monitor_service.running:
@@ -190,10 +213,13 @@ class TradingTimeScheduler:
                     print("🔔 检测到非交易时间，自动停止监测服务")
                     self.monitor_service.stop_monitoring()
                 
-                time.sleep(60)  # 每分钟检查一次
+                wait_seconds = 60
+                if tasks:
+                    wait_seconds = min(wait_seconds, max((tasks[0][0] - datetime.now()).total_seconds(), 0))
+                self._wake.wait(wait_seconds)  # 最多每分钟检查一次，stop_scheduler时立即唤醒
             except Exception as e:
                 print(f"❌ 调度器错误: {e}")
-                time.sleep(60)
+                self._wake.wait(60)
     
     def _auto_start_monitoring(self):
         """自动启动监测"""
@@ -1,9 +1,8 @@
 import time
 import threading
-import schedule
-from datetime import datetime, timedelta
-from typing import Dict, List
-import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
 import os
 import logging
 
@@ -20,6 +19,13 @@ except ImportError:
     TDX_AVAILABLE = False
     logging.warning("TDX数据源模块未找到，将使用默认数据源")
 
+# 触发通知的消息模板
+TRIGGER_MESSAGE_TEMPLATES = {
+    'entry': "股票 {symbol} ({name}) 价格 {price} 进入进场区间 [{entry_min}-{entry_max}]",
+    'take_profit': "股票 {symbol} ({name}) 价格 {price} 达到止盈位 {take_profit}",
+    'stop_loss': "股票 {symbol} ({name}) 价格 {price} 达到止损位 {stop_loss}",
+}
+
 class StockMonitorService:
     """股票监测服务"""
     
@@ -44,75 +50,84 @@ class StockMonitorService:
         
         self.running = False
         self.thread = None
+        self._stop_event = threading.Event()
     
-    def start_monitoring(self):
-        """启动监测服务"""
+    def start_monitoring(self) -> str:
+        """启动监测服务，返回状态消息（由调用方决定如何展示）"""
         if self.running:
-            return
+            return "⚠️ 监测服务已在运行"
         
         self.running = True
+        self._stop_event.clear()
         self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.thread.start()
-        st.success("✅ 监测服务已启动")
+        return "✅ 监测服务已启动"
     
-    def stop_monitoring(self):
-        """停止监测服务"""
+    def stop_monitoring(self) -> str:
+        """停止监测服务，返回状态消息（由调用方决定如何展示）"""
         self.running = False
+        self._stop_event.set()  # 立即唤醒等待中的监测线程
         if self.thread:
             self.thread.join(timeout=5)
-        st.info("⏹️ 监测服务已停止")
+        return "⏹️ 监测服务已停止"
     
     def _monitor_loop(self):
         """监测循环"""
         print("监测服务已启动")
-        while self.running:
+        while not self._stop_event.is_set():
             try:
                 self._check_all_stocks()
                 # 根据最小监测间隔决定循环间隔，最少5分钟检查一次
-                time.sleep(300)  # 每5分钟检查一次
+                self._stop_event.wait(300)  # 每5分钟检查一次，停止时立即返回
             except Exception as e:
                 print(f"监测服务错误: {e}")
-                time.sleep(60)  # 错误后等待1分钟再重试
+                self._stop_event.wait(60)  # 错误后等待1分钟再重试
     
     def _check_all_stocks(self):
         """检查所有监测股票"""
         stocks = monitor_db.get_monitored_stocks()
-        current_time = datetime.now()
+        now_ts = time.time()
         
         updated_count = 0
+        notify_pending = False
+        # 一次性查询最近60分钟内的通知，代替逐只股票逐类型查询数据库
+        recent_notifications = monitor_db.get_recent_notification_map(minutes=60)
         for stock in stocks:
-            # 检查是否需要更新价格
-            last_checked = stock.get('last_checked')
-            check_interval = stock.get('check_interval', 30)
+            if self._stop_event.is_set():
+                break
             
-            if last_checked:
-                last_checked_dt = datetime.fromisoformat(last_checked)
-                next_check = last_checked_dt + timedelta(minutes=check_interval)
-                if current_time < next_check:
-                    # 显示距离下次检查的时间
-                    time_left = (next_check - current_time).total_seconds() / 60
-                    print(f"股票 {stock['symbol']} 距离下次检查还有 {time_left:.1f} 分钟")
-                    continue
+            # 检查是否需要更新价格
+            seconds_left = self._seconds_until_due(stock, now_ts)
+            if seconds_left > 0:
+                # 显示距离下次检查的时间
+                print(f"股票 {stock['symbol']} 距离下次检查还有 {seconds_left / 60:.1f} 分钟")
+                continue
             
             try:
                 print(f"正在更新股票 {stock['symbol']} 的价格...")
-                self._update_stock_price(stock)
+                if self._update_stock_price(stock, recent_notifications):
+                    notify_pending = True
                 updated_count += 1
                 
                 # 在每个股票请求之间增加延迟，避免API限流
                 if updated_count < len(stocks):
-                    time.sleep(3)  # 每个股票之间等待3秒
+                    self._stop_event.wait(3)  # 每个股票之间等待3秒
             except Exception as e:
                 print(f"❌ 更新股票 {stock['symbol']} 价格失败: {e}")
-                time.sleep(3)  # 失败后也等待3秒再继续
+                self._stop_event.wait(3)  # 失败后也等待3秒再继续
         
         if updated_count > 0:
             print(f"✅ 本轮共更新了 {updated_count} 只股票")
+        
+        # 本轮产生的通知统一发送一次（包括邮件），避免每次触发都单独发送
+        if notify_pending:
+            notification_service.send_notifications()
     
-    def _update_stock_price(self, stock: Dict):
-        """更新股票价格并检查条件"""
+    def _update_stock_price(self, stock: Dict, recent_notifications: Optional[Dict] = None) -> bool:
+        """更新股票价格并检查条件，返回是否产生了待发送的通知"""
         symbol = stock['symbol']
         current_price = None
+        notify_pending = False
         
         # 获取最新价格
         try:
@@ -141,7 +156,9 @@ class StockMonitorService:
                     print(f"✅ {symbol} 当前价格: ¥{current_price}")
                     
                     # 检查触发条件
-                    self._check_trigger_conditions(stock, current_price)
+                    notify_pending = self._check_trigger_conditions(
+                        stock, current_price, recent_notifications
+                    )
                 except (ValueError, TypeError) as e:
                     print(f"❌ 股票 {symbol} 价格格式错误: {current_price}")
                     # 即使失败也更新last_checked，避免持续重试
@@ -158,6 +175,8 @@ class StockMonitorService:
                 monitor_db.update_last_checked(stock['id'])
             except:
                 pass
+        
+        return notify_pending
     
     def _is_a_stock(self, symbol: str) -> bool:
         """判断是否为A股（6位数字）"""
@@ -176,71 +195,74 @@ class StockMonitorService:
             print(f"默认数据源获取失败: {e}")
             return None
     
-    def _check_trigger_conditions(self, stock: Dict, current_price: float):
-        """检查触发条件"""
+    def _check_trigger_conditions(self, stock: Dict, current_price: float,
+                                  recent_notifications: Optional[Dict] = None) -> bool:
+        """
+        检查触发条件，返回是否产生了待发送的通知
+        
+        Args:
+            recent_notifications: 本轮预取的 {(stock_id, type): 触发时间}，
+                为None时通过get_recent_notification_map查询最近60分钟的通知
+        """
         if not stock.get('notification_enabled', True):
-            return
+            return False
+        
+        if recent_notifications is None:
+            recent_notifications = monitor_db.get_recent_notification_map(minutes=60)
         
-        entry_range = stock.get('entry_range', {})
+        notify_pending = False
+        
+        # 一次性取出常用字段，避免在各分支中重复查字典
+        stock_id = stock['id']
+        symbol = stock['symbol']
+        name = stock['name']
+        quant_enabled = stock.get('quant_enabled', False)
+        entry_range = stock.get('entry_range') or {}
+        entry_min = entry_range.get('min')
+        entry_max = entry_range.get('max')
         take_profit = stock.get('take_profit')
         stop_loss = stock.get('stop_loss')
         
-        # 检查进场区间
-        if entry_range and entry_range.get('min') and entry_range.get('max'):
-            if current_price >= entry_range['min'] and current_price <= entry_range['max']:
-                # 检查是否在最近60分钟内已发送过相同通知，避免重复
-                if not monitor_db.has_recent_notification(stock['id'], 'entry', minutes=60):
-                    message = f"股票 {stock['symbol']} ({stock['name']}) 价格 {current_price} 进入进场区间 [{entry_range['min']}-{entry_range['max']}]"
-                    monitor_db.add_notification(stock['id'], 'entry', message)
-                    
-                    # 立即发送通知（包括邮件）
-                    notification_service.send_notifications()
-                
-                # 如果启用量化交易，执行自动交易
-                if stock.get('quant_enabled', False):
-                    self._execute_quant_trade(stock, 'entry', current_price)
-        
-        # 检查止盈
+        # 一次比较得出所有触发的信号，再统一处理通知和量化交易
+        triggered = []
+        if entry_min and entry_max and entry_min <= current_price <= entry_max:
+            triggered.append('entry')
         if take_profit and current_price >= take_profit:
-            # 检查是否在最近60分钟内已发送过相同通知，避免重复
-            if not monitor_db.has_recent_notification(stock['id'], 'take_profit', minutes=60):
-                message = f"股票 {stock['symbol']} ({stock['name']}) 价格 {current_price} 达到止盈位 {take_profit}"
-                monitor_db.add_notification(stock['id'], 'take_profit', message)
-                
-                # 立即发送通知（包括邮件）
-                notification_service.send_notifications()
-            
-            # 如果启用量化交易，执行自动交易
-            if stock.get('quant_enabled', False):
-                self._execute_quant_trade(stock, 'take_profit', current_price)
-        
-        # 检查止损
+            triggered.append('take_profit')
         if stop_loss and current_price <= stop_loss:
-            # 检查是否在最近60分钟内已发送过相同通知，避免重复
-            if not monitor_db.has_recent_notification(stock['id'], 'stop_loss', minutes=60):
-                message = f"股票 {stock['symbol']} ({stock['name']}) 价格 {current_price} 达到止损位 {stop_loss}"
-                monitor_db.add_notification(stock['id'], 'stop_loss', message)
-                
-                # 立即发送通知（包括邮件）
-                notification_service.send_notifications()
+            triggered.append('stop_loss')
+        
+        for signal_type in triggered:
+            # 先检查最近60分钟内是否已发送过相同通知，被抑制时不再构造消息
+            if (stock_id, signal_type) not in recent_notifications:
+                message = TRIGGER_MESSAGE_TEMPLATES[signal_type].format(
+                    symbol=symbol, name=name, price=current_price,
+                    entry_min=entry_min, entry_max=entry_max,
+                    take_profit=take_profit, stop_loss=stop_loss
+                )
+                monitor_db.add_notification(stock_id, signal_type, message)
+                recent_notifications[(stock_id, signal_type)] = datetime.now().isoformat()
+                notify_pending = True
             
             # 如果启用量化交易，执行自动交易
-            if stock.get('quant_enabled', False):
-                self._execute_quant_trade(stock, 'stop_loss', current_price)
+            if quant_enabled and self._execute_quant_trade(stock, signal_type, current_price):
+                notify_pending = True
+        
+        return notify_pending
     
-    def _execute_quant_trade(self, stock: Dict, signal_type: str, current_price: float):
-        """执行量化交易"""
+    def _execute_quant_trade(self, stock: Dict, signal_type: str, current_price: float) -> bool:
+        """执行量化交易，返回是否记录了交易通知"""
         try:
             # 检查MiniQMT是否连接
             if not miniqmt.is_connected():
                 print(f"MiniQMT未连接，无法执行 {stock['symbol']} 的量化交易")
-                return
+                return False
             
             # 获取量化配置
             quant_config = stock.get('quant_config', {})
             if not quant_config:
                 print(f"股票 {stock['symbol']} 未配置量化参数")
-                return
+                return False
             
             # 执行策略信号
             signal = {
@@ -265,43 +287,62 @@ class StockMonitorService:
                     'quant_trade', 
                     f"量化交易执行: {msg}"
                 )
-                # 立即发送通知（包括邮件）
-                notification_service.send_notifications()
+                return True
             else:
                 print(f"❌ 量化交易失败: {stock['symbol']} - {msg}")
                 
         except Exception as e:
             print(f"执行量化交易异常: {stock['symbol']} - {str(e)}")
+        
+        return False
     
     def get_stocks_needing_update(self) -> List[Dict]:
         """获取需要更新价格的股票"""
         stocks = monitor_db.get_monitored_stocks()
-        current_time = datetime.now()
-        need_update = []
-        
-        for stock in stocks:
-            last_checked = stock.get('last_checked')
-            check_interval = stock.get('check_interval', 30)
-            
-            if not last_checked:
-                need_update.append(stock)
-                continue
-            
-            last_checked_dt = datetime.fromisoformat(last_checked)
-            next_check = last_checked_dt + timedelta(minutes=check_interval)
-            if current_time >= next_check:
-                need_update.append(stock)
-        
-        return need_update
+        now_ts = time.time()
+        return [stock for stock in stocks if self._seconds_until_due(stock, now_ts) <= 0]
+    
+    @staticmethod
+    def _seconds_until_due(stock: Dict, now_ts: float) -> float:
+        """距离下次需要检查的秒数，<=0 表示已到期（从未检查过的股票立即到期）"""
+        last_checked = stock.get('last_checked')
+        if not last_checked:
+            return 0
+        check_interval = stock.get('check_interval', 30)
+        last_ts = datetime.fromisoformat(last_checked).timestamp()
+        return last_ts + check_interval * 60 - now_ts
     
     def manual_update_stock(self, stock_id: int):
         """手动更新股票价格"""
         stock = monitor_db.get_stock_by_id(stock_id)
         if stock:
-            self._update_stock_price(stock)
+            if self._update_stock_price(stock):
+                notification_service.send_notifications()
             return True
         return False
     
+    def manual_update_stocks(self, stock_ids: List[int], max_workers: int = 8) -> int:
+        """并行手动更新多只股票价格，返回成功更新的数量"""
+        if not stock_ids:
+            return 0
+        
+        recent_notifications = monitor_db.get_recent_notification_map(minutes=60)
+        
+        def update_one(stock_id: int):
+            stock = monitor_db.get_stock_by_id(stock_id)
+            if not stock:
+                return False, False
+            return True, self._update_stock_price(stock, recent_notifications)
+        
+        # 行情获取以网络等待为主，用线程池并行；通知在调用线程统一发送一次
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(stock_ids))) as executor:
+            results = list(executor.map(update_one, stock_ids))
+        
+        if any(notify_pending for _, notify_pending in results):
+            notification_service.send_notifications()
+        
+        return sum(1 for updated, _ in results if updated)
+    
     def get_scheduler(self):
         """获取调度器实例"""
         from monitor_scheduler import get_scheduler
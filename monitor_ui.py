@@ -1,11 +1,82 @@
 import streamlit as st
+import time
+import uuid
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from monitor_db import monitor_db
 from monitor_service import monitor_service
 from notification_service import notification_service
 
+# 评级图标
+RATING_ICONS = {
+    '买入': '🟢',
+    '持有': '🟡',
+    '卖出': '🔴'
+}
+
+# 手动批量更新的最小间隔（秒）
+BULK_UPDATE_COOLDOWN = 10
+
+# 提醒类型图标
+NOTIFICATION_ICONS = {
+    'entry': '🟢',
+    'take_profit': '🟡',
+    'stop_loss': '🔴'
+}
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _cached_monitored_stocks() -> List[Dict]:
+    """获取监测股票列表（短时缓存，避免每次重跑都查询数据库）"""
+    stocks = monitor_db.get_monitored_stocks()
+    # 预先计算卡片展示字段，渲染时只需输出
+    for stock in stocks:
+        _prepare_card_fields(stock)
+    return stocks
+
+def _prepare_card_fields(stock: Dict):
+    """一次性计算监测卡片的展示文本"""
+    trading_hours_only = stock.get('trading_hours_only', True)
+    stock['trading_badge'] = "🕒仅交易时段" if trading_hours_only else "🌐全时段"
+    stock['monitor_mode_display'] = (
+        "⏰ 监控模式：交易日 9:30-11:30, 13:00-15:00" if trading_hours_only else "🌐 监控模式：全天候"
+    )
+    stock['rating_display'] = f"{RATING_ICONS.get(stock['rating'], '⚪')} {stock['rating']}"
+    
+    current_price = stock.get('current_price')
+    stock['price_display'] = f"¥{current_price}" if current_price and current_price != 'N/A' else "等待更新"
+    
+    last_checked = stock.get('last_checked')
+    stock['last_checked_display'] = (
+        datetime.fromisoformat(last_checked).strftime('%m-%d %H:%M') if last_checked else ''
+    )
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _cached_stocks_needing_update() -> List[Dict]:
+    """获取需要更新价格的股票（短时缓存）"""
+    return monitor_service.get_stocks_needing_update()
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _cached_pending_notifications() -> List[Dict]:
+    """获取待发送通知（短时缓存）"""
+    return monitor_db.get_pending_notifications()
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _cached_scheduler_running() -> Optional[bool]:
+    """定时调度是否运行（短时缓存），调度器尚未创建时返回None"""
+    # 不传监测服务只查询已有实例，不会在这里创建调度器
+    from monitor_scheduler import get_scheduler
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return None
+    return scheduler.running
+
+def _clear_monitor_cache():
+    """监测数据变更后清除缓存"""
+    _cached_monitored_stocks.clear()
+    _cached_stocks_needing_update.clear()
+    _cached_pending_notifications.clear()
+
 def display_monitor_panel():
     """显示监测面板"""
     
@@ -16,30 +87,37 @@ def display_monitor_panel():
     
     with col1:
         if st.button("▶️ 启动监测服务", type="primary"):
-            monitor_service.start_monitoring()
+            st.success(monitor_service.start_monitoring())
     
     with col2:
         if st.button("⏹️ 停止监测服务"):
-            monitor_service.stop_monitoring()
+            st.info(monitor_service.stop_monitoring())
     
     with col3:
         if st.button("🔄 手动更新所有"):
-            stocks = monitor_service.get_stocks_needing_update()
-            for stock in stocks:
-                monitor_service.manual_update_stock(stock['id'])
-            st.success(f"✅ 已手动更新 {len(stocks)} 只股票")
+            # 限制连续点击，避免重复发起批量行情请求
+            if time.time() - st.session_state.get('last_bulk_update', 0) < BULK_UPDATE_COOLDOWN:
+                st.warning("⏳ 刚刚已更新，请稍候再试")
+            else:
+                st.session_state.last_bulk_update = time.time()
+                stocks = monitor_service.get_stocks_needing_update()
+                if not stocks:
+                    st.info("✅ 暂无需要更新的股票")
+                else:
+                    with st.status(f"正在更新 {len(stocks)} 只股票...", expanded=False) as status:
+                        updated = monitor_service.manual_update_stocks([stock['id'] for stock in stocks])
+                        status.update(label=f"✅ 已手动更新 {updated} 只股票", state="complete")
+                    _clear_monitor_cache()
     
     with col4:
         # 显示定时调度状态
-        try:
-            scheduler = monitor_service.get_scheduler()
-            status = scheduler.get_status()
-            if status['scheduler_running']:
-                st.success("⏰ 定时已启用")
-            else:
-                st.info("⏰ 定时未启用")
-        except:
+        scheduler_running = _cached_scheduler_running()
+        if scheduler_running is None:
             st.info("⏰ 定时未配置")
+        elif scheduler_running:
+            st.success("⏰ 定时已启用")
+        else:
+            st.info("⏰ 定时未启用")
     
     # 显示通知
     display_notifications()
@@ -47,31 +125,27 @@ def display_monitor_panel():
     # 显示监测股票
     display_monitored_stocks()
 
+@st.fragment
 def display_notifications():
-    """显示通知"""
+    """显示通知（fragment：清空提醒时只重跑本区域）"""
     notifications = notification_service.get_streamlit_notifications()
     
     if notifications:
         st.markdown("### 🔔 最新提醒")
         
         for notification in notifications[-5:]:  # 只显示最近5条
-            notification_type = notification['type']
-            color_map = {
-                'entry': '🟢',
-                'take_profit': '🟡', 
-                'stop_loss': '🔴'
-            }
-            icon = color_map.get(notification_type, '🔵')
+            icon = NOTIFICATION_ICONS.get(notification['type'], '🔵')
             
             st.info(f"{icon} **{notification['symbol']}** - {notification['message']}")
         
         if st.button("清空提醒"):
             notification_service.clear_streamlit_notifications()
-            st.rerun()
+            st.rerun(scope="fragment")
 
+@st.fragment(run_every=30)
 def display_monitored_stocks():
-    """显示监测股票卡片"""
-    stocks = monitor_db.get_monitored_stocks()
+    """显示监测股票卡片（fragment：按钮操作只重跑本区域，并每30秒自动刷新）"""
+    stocks = _cached_monitored_stocks()
     
     if not stocks:
         st.info("📋 暂无监测股票，请在分析完成后点击'加入监测'按钮添加")
@@ -90,26 +164,20 @@ def display_monitored_stocks():
 def display_stock_card(stock: Dict):
     """显示单个股票监测卡片（显示交易时段设置）"""
     
+    if 'rating_display' not in stock:
+        _prepare_card_fields(stock)
+    
     with st.container():
         # 标题行：添加交易时段标识
-        trading_badge = "🕒仅交易时段" if stock.get('trading_hours_only', True) else "🌐全时段"
-        st.markdown(f"### {stock['symbol']} - {stock['name']} {trading_badge}")
+        st.markdown(f"### {stock['symbol']} - {stock['name']} {stock['trading_badge']}")
         
         # 评级和状态
         col1, col2 = st.columns([1, 1])
         with col1:
-            rating_color = {
-                '买入': '🟢',
-                '持有': '🟡',
-                '卖出': '🔴'
-            }
-            st.metric("评级", f"{rating_color.get(stock['rating'], '⚪')} {stock['rating']}")
+            st.metric("评级", stock['rating_display'])
         
         with col2:
-            if stock['current_price'] and stock['current_price'] != 'N/A':
-                st.metric("当前价格", f"¥{stock['current_price']}")
-            else:
-                st.metric("当前价格", "等待更新")
+            st.metric("当前价格", stock['price_display'])
         
         # 关键价位
         entry_range = stock['entry_range']
@@ -122,21 +190,18 @@ def display_stock_card(stock: Dict):
             st.error(f"**止损位**: ¥{stock['stop_loss']}")
         
         # 最后更新时间和监控模式
-        if stock['last_checked']:
-            last_checked = datetime.fromisoformat(stock['last_checked'])
-            st.caption(f"最后更新: {last_checked.strftime('%m-%d %H:%M')}")
+        if stock.get('last_checked_display'):
+            st.caption(f"最后更新: {stock['last_checked_display']}")
         
         # 监控模式提示
-        if stock.get('trading_hours_only', True):
-            st.caption("⏰ 监控模式：交易日 9:30-11:30, 13:00-15:00")
-        else:
-            st.caption("🌐 监控模式：全天候")
+        st.caption(stock['monitor_mode_display'])
         
         # 操作按钮
         col1, col2 = st.columns([1, 1])
         with col1:
             if st.button("🔄 更新", key=f"update_{stock['id']}"):
                 if monitor_service.manual_update_stock(stock['id']):
+                    _clear_monitor_cache()
                     st.success("✅ 更新成功")
                 else:
                     st.error("❌ 更新失败")
@@ -144,8 +209,9 @@ def display_stock_card(stock: Dict):
         with col2:
             if st.button("🗑️ 移除", key=f"remove_{stock['id']}"):
                 monitor_db.remove_monitored_stock(stock['id'])
+                _clear_monitor_cache()
                 st.success("✅ 已移除监测")
-                st.rerun()
+                st.rerun(scope="fragment")
 
 def add_to_monitor_dialog(stock_info: Dict, analysis_result: Dict):
     """显示添加到监测的对话框（支持交易时段选项）"""
@@ -159,8 +225,6 @@ def add_to_monitor_dialog(stock_info: Dict, analysis_result: Dict):
     reasoning = final_decision.get('reasoning', '')
     
     # 生成唯一的session标识符
-    import uuid
-    import time
     session_id = f"{stock_info.get('symbol', 'unknown')}_{int(time.time())}_{uuid.uuid4().hex[:6]}"
     
     # 解析关键价位（从分析结果中提取或手动输入）
@@ -227,17 +291,18 @@ def add_to_monitor_dialog(stock_info: Dict, analysis_result: Dict):
             
             # 立即更新一次价格
             monitor_service.manual_update_stock(stock_id)
+            _clear_monitor_cache()
         else:
             st.error("❌ 请设置有效的进场区间")
 
 def get_monitor_summary() -> Dict:
     """获取监测摘要信息"""
-    stocks = monitor_db.get_monitored_stocks()
+    stocks = _cached_monitored_stocks()
     
     summary = {
         'total_stocks': len(stocks),
-        'stocks_needing_update': len(monitor_service.get_stocks_needing_update()),
-        'pending_notifications': len(monitor_db.get_pending_notifications()),
+        'stocks_needing_update': len(_cached_stocks_needing_update()),
+        'pending_notifications': len(_cached_pending_notifications()),
         'active_monitoring': monitor_service.running
     }
     
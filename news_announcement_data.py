@@ -5,31 +5,25 @@
 
 import pandas as pd
 import pywencai
-import sys
-import io
+import os
+import re
+import json
+import time
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from utils.pywencai_helper import safe_get
 
 warnings.filterwarnings('ignore')
 
-# 设置标准输出编码为UTF-8（仅在命令行环境，避免streamlit冲突）
-def _setup_stdout_encoding():
-    """仅在命令行环境设置标准输出编码"""
-    if sys.platform == 'win32' and not hasattr(sys.stdout, '_original_stream'):
-        try:
-            # 检测是否在streamlit环境中
-            import streamlit
-            # 在streamlit中不修改stdout
-            return
-        except ImportError:
-            # 不在streamlit环境，可以安全修改
-            try:
-                sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='ignore')
-            except:
-                pass
+# 问财查询结果磁盘缓存（按 股票代码+类型+日期 存放，30分钟内重复查看直接读取本地）
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "news_announcement")
+CACHE_TTL = 1800
+_cache_lock = threading.Lock()
 
-_setup_stdout_encoding()
+# A股代码：6位数字
+A_SHARE_SYMBOL_RE = re.compile(r'\d{6}')
 
 
 class NewsAnnouncementDataFetcher:
@@ -61,16 +55,22 @@ class NewsAnnouncementDataFetcher:
             return data
         
         try:
-            # 获取新闻数据
-            print("📰 正在获取最新新闻数据...")
-            news_data = self._get_news_data(symbol)
+            # 新闻和公告两次问财查询互不依赖，并行获取
+            print("📰📢 正在获取最新新闻和公告数据...")
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                news_future = executor.submit(
+                    self._get_with_cache, symbol, "news", self._get_news_data
+                )
+                announcement_future = executor.submit(
+                    self._get_with_cache, symbol, "announcement", self._get_announcement_data
+                )
+                news_data = news_future.result()
+                announcement_data = announcement_future.result()
+            
             if news_data:
                 data["news_data"] = news_data
                 print(f"   ✓ 成功获取 {len(news_data.get('items', []))} 条新闻")
             
-            # 获取公告数据
-            print("📢 正在获取最新公告数据...")
-            announcement_data = self._get_announcement_data(symbol)
             if announcement_data:
                 data["announcement_data"] = announcement_data
                 print(f"   ✓ 成功获取 {len(announcement_data.get('items', []))} 条公告")
@@ -88,106 +88,98 @@ class NewsAnnouncementDataFetcher:
         
         return data
     
+    def _cache_path(self, symbol, kind):
+        """缓存文件路径，文件名包含日期，跨天自动失效"""
+        date_str = datetime.now().strftime('%Y%m%d')
+        return os.path.join(CACHE_DIR, f"{symbol}_{kind}_{date_str}.json")
+    
+    def _prune_cache(self):
+        """删除非当天的缓存文件（跨天后已失效，避免目录无限增长）"""
+        today_suffix = f"_{datetime.now().strftime('%Y%m%d')}.json"
+        for entry in os.scandir(CACHE_DIR):
+            if entry.is_file() and not entry.name.endswith(today_suffix):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+    
+    def _get_with_cache(self, symbol, kind, fetch_func):
+        """先读磁盘缓存，未命中或过期时调用 fetch_func 查询并写回缓存"""
+        cache_path = self._cache_path(symbol, kind)
+        
+        try:
+            if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < CACHE_TTL:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                print(f"   使用缓存数据: {symbol} {kind}")
+                return cached
+        except Exception as e:
+            print(f"   读取缓存失败: {e}")
+        
+        result = fetch_func(symbol)
+        
+        if result:
+            try:
+                with _cache_lock:
+                    os.makedirs(CACHE_DIR, exist_ok=True)
+                    tmp_path = cache_path + ".tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(result, f, ensure_ascii=False)
+                    os.replace(tmp_path, cache_path)
+                    self._prune_cache()
+            except Exception as e:
+                print(f"   写入缓存失败: {e}")
+        
+        return result
+    
     def _is_chinese_stock(self, symbol):
         """判断是否为中国股票"""
-        return symbol.isdigit() and len(symbol) == 6
+        return A_SHARE_SYMBOL_RE.fullmatch(symbol) is not None
     
-    def _get_news_data(self, symbol):
-        """获取新闻数据"""
-        try:
-            # 构建问句
-            query = f"{symbol}新闻"
-            
-            print(f"   使用问财查询: {query}")
-            
-            # 使用pywencai查询
-            result = safe_get(query=query, loop=True)
-            
-            if result is None:
-                print(f"   问财查询返回None")
-                return None
-            
-            # 处理不同类型的返回结果
-            df_result = None
-            
-            if isinstance(result, dict):
-                try:
-                    df_result = pd.DataFrame([result])
-                except Exception as e:
-                    print(f"   无法转换为DataFrame: {e}")
-                    return None
-            elif isinstance(result, pd.DataFrame):
-                df_result = result
-            else:
-                print(f"   问财返回未知类型: {type(result)}")
-                return None
-            
-            if df_result is None or df_result.empty:
-                print(f"   查询结果为空")
-                return None
-            
-            # 检查是否是嵌套结构
-            if 'tableV1' in df_result.columns and len(df_result.columns) == 1:
-                table_v1_data = df_result.iloc[0]['tableV1']
-                if isinstance(table_v1_data, pd.DataFrame):
-                    df_result = table_v1_data
-                elif isinstance(table_v1_data, list) and len(table_v1_data) > 0:
-                    df_result = pd.DataFrame(table_v1_data)
-                else:
-                    print(f"   tableV1数据类型不支持: {type(table_v1_data)}")
-                    return None
-            
-            if df_result is None or df_result.empty:
-                return None
-            
-            # 提取新闻数据
-            news_items = []
-            
-            # 限制数量
-            df_result = df_result.head(self.max_items)
-            
-            for idx, row in df_result.iterrows():
-                item = {}
-                
-                # 尝试提取常见的新闻字段
-                for col in df_result.columns:
-                    col_lower = str(col).lower()
-                    value = row.get(col)
-                    
-                    # 跳过空值和DataFrame类型
-                    if value is None or (isinstance(value, float) and pd.isna(value)):
-                        continue
-                    if isinstance(value, pd.DataFrame):
-                        continue
-                    
-                    # 保存字段
-                    try:
-                        item[col] = str(value)
-                    except:
-                        item[col] = "无法解析"
+    def _extract_items(self, records):
+        """将查询结果记录转换为 {字段: 字符串} 列表，跳过空值和嵌套DataFrame"""
+        items = []
+        for record in records:
+            item = {}
+            for col, value in record.items():
+                # 跳过空值和DataFrame类型
+                if value is None or (isinstance(value, float) and pd.isna(value)):
+                    continue
+                if isinstance(value, pd.DataFrame):
+                    continue
                 
-                if item:  # 如果有数据才添加
-                    news_items.append(item)
-            
-            if not news_items:
-                return None
-            
-            return {
-                "items": news_items,
-                "count": len(news_items),
-                "columns": df_result.columns.tolist(),
-                "query_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
+                # 保存字段
+                try:
+                    item[col] = str(value)
+                except:
+                    item[col] = "无法解析"
             
-        except Exception as e:
-            print(f"   获取新闻数据异常: {e}")
-            return None
+            if item:  # 如果有数据才添加
+                items.append(item)
+        return items
+    
+    def _get_news_data(self, symbol):
+        """获取新闻数据"""
+        return self._fetch_wencai(symbol, "新闻")
     
     def _get_announcement_data(self, symbol):
         """获取公告数据"""
+        return self._fetch_wencai(symbol, "公告")
+    
+    def _fetch_wencai(self, symbol, suffix):
+        """
+        使用问财查询 "{symbol}{suffix}" 并整理为条目列表
+        
+        Args:
+            symbol: 股票代码
+            suffix: 查询后缀，如"新闻"、"公告"
+            
+        Returns:
+            dict: {items, count, columns, query_time}，无数据时返回None
+        """
         try:
             # 构建问句
-            query = f"{symbol}公告"
+            query = f"{symbol}{suffix}"
             
             print(f"   使用问财查询: {query}")
             
@@ -198,79 +190,55 @@ class NewsAnnouncementDataFetcher:
                 print(f"   问财查询返回None")
                 return None
             
-            # 处理不同类型的返回结果
-            df_result = None
-            
+            # 处理不同类型的返回结果：字典结果直接取行数据，不经过DataFrame往返
             if isinstance(result, dict):
-                try:
-                    df_result = pd.DataFrame([result])
-                except Exception as e:
-                    print(f"   无法转换为DataFrame: {e}")
-                    return None
+                if 'tableV1' in result and len(result) == 1:
+                    rows = result['tableV1']
+                else:
+                    rows = [result]
             elif isinstance(result, pd.DataFrame):
-                df_result = result
+                if result.empty:
+                    print(f"   查询结果为空")
+                    return None
+                rows = result
+                # 检查是否是嵌套结构
+                if 'tableV1' in rows.columns and len(rows.columns) == 1:
+                    rows = rows.iloc[0]['tableV1']
             else:
                 print(f"   问财返回未知类型: {type(result)}")
                 return None
             
-            if df_result is None or df_result.empty:
-                print(f"   查询结果为空")
-                return None
+            if isinstance(rows, list) and rows and not all(isinstance(row, dict) for row in rows):
+                rows = pd.DataFrame(rows)
             
-            # 检查是否是嵌套结构
-            if 'tableV1' in df_result.columns and len(df_result.columns) == 1:
-                table_v1_data = df_result.iloc[0]['tableV1']
-                if isinstance(table_v1_data, pd.DataFrame):
-                    df_result = table_v1_data
-                elif isinstance(table_v1_data, list) and len(table_v1_data) > 0:
-                    df_result = pd.DataFrame(table_v1_data)
-                else:
-                    print(f"   tableV1数据类型不支持: {type(table_v1_data)}")
+            # 限制数量并提取数据
+            if isinstance(rows, pd.DataFrame):
+                if rows.empty:
                     return None
-            
-            if df_result is None or df_result.empty:
+                rows = rows.head(self.max_items)
+                columns = rows.columns.tolist()
+                records = rows.to_dict(orient="records")
+            elif isinstance(rows, list) and len(rows) > 0:
+                columns = list(dict.fromkeys(col for row in rows for col in row))
+                records = rows[:self.max_items]
+            else:
+                print(f"   tableV1数据类型不支持: {type(rows)}")
                 return None
             
-            # 提取公告数据
-            announcement_items = []
-            
-            # 限制数量
-            df_result = df_result.head(self.max_items)
-            
-            for idx, row in df_result.iterrows():
-                item = {}
-                
-                # 尝试提取常见的公告字段
-                for col in df_result.columns:
-                    value = row.get(col)
-                    
-                    # 跳过空值和DataFrame类型
-                    if value is None or (isinstance(value, float) and pd.isna(value)):
-                        continue
-                    if isinstance(value, pd.DataFrame):
-                        continue
-                    
-                    # 保存字段
-                    try:
-                        item[col] = str(value)
-                    except:
-                        item[col] = "无法解析"
-                
-                if item:  # 如果有数据才添加
-                    announcement_items.append(item)
+            items = self._extract_items(records)
             
-            if not announcement_items:
+            if not items:
                 return None
             
             return {
-                "items": announcement_items,
-                "count": len(announcement_items),
-                "columns": df_result.columns.tolist(),
+                "items": items,
+                "count": len(items),
+                "columns": columns,
                 "query_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             
         except Exception as e:
-            print(f"   获取公告数据异常: {e}")
+            print(f"   获取{suffix}数据异常: {e}")
             return None
     
     def format_news_announcements_for_ai(self, data):
@@ -280,53 +248,53 @@ class NewsAnnouncementDataFetcher:
         if not data or not data.get("data_success"):
             return "未能获取新闻公告数据"
         
-        text_parts = []
-        
+        return "\n".join(self._format_lines(data))
+    
+    def _format_lines(self, data):
+        """逐行生成新闻和公告文本"""
         # 新闻数据
         if data.get("news_data"):
-            news_data = data["news_data"]
-            text_parts.append(f"""
-【最新新闻】
-查询时间：{news_data.get('query_time', 'N/A')}
-新闻数量：{news_data.get('count', 0)}条
-
-""")
-            
-            for idx, item in enumerate(news_data.get('items', []), 1):
-                text_parts.append(f"新闻 {idx}:")
-                for key, value in item.items():
-                    # 跳过过长的字段
-                    if len(str(value)) > 500:
-                        value = str(value)[:500] + "..."
-                    text_parts.append(f"  {key}: {value}")
-                text_parts.append("")  # 空行分隔
+            yield from self._format_section_lines(data["news_data"], "最新新闻", "新闻")
         
         # 公告数据
         if data.get("announcement_data"):
-            announcement_data = data["announcement_data"]
-            text_parts.append(f"""
-【最新公告】
-查询时间：{announcement_data.get('query_time', 'N/A')}
-公告数量：{announcement_data.get('count', 0)}条
+            yield from self._format_section_lines(data["announcement_data"], "最新公告", "公告")
+    
+    def _format_section_lines(self, section_data, title, label):
+        """生成单个分区（新闻或公告）的文本行"""
+        yield f"""
+【{title}】
+查询时间：{section_data.get('query_time', 'N/A')}
+{label}数量：{section_data.get('count', 0)}条
 
-""")
-            
-            for idx, item in enumerate(announcement_data.get('items', []), 1):
-                text_parts.append(f"公告 {idx}:")
-                for key, value in item.items():
-                    # 跳过过长的字段
-                    if len(str(value)) > 500:
-                        value = str(value)[:500] + "..."
-                    text_parts.append(f"  {key}: {value}")
-                text_parts.append("")  # 空行分隔
+"""
         
-        return "\n".join(text_parts)
+        for idx, item in enumerate(section_data.get('items', []), 1):
+            yield f"{label} {idx}:"
+            for key, value in item.items():
+                # 截断过长的字段
+                text = str(value)
+                if len(text) > 500:
+                    text = text[:500] + "..."
+                yield f"  {key}: {text}"
+            yield ""  # 空行分隔
+
+
+# 全局数据获取实例（延迟初始化）
+_fetcher_instance = None
+
+def get_fetcher() -> NewsAnnouncementDataFetcher:
+    """获取新闻公告数据获取实例（进程内单例）"""
+    global _fetcher_instance
+    if _fetcher_instance is None:
+        _fetcher_instance = NewsAnnouncementDataFetcher()
+    return _fetcher_instance
 
 
 # 测试函数
 if __name__ == "__main__":
     print("测试新闻公告数据获取...")
-    fetcher = NewsAnnouncementDataFetcher()
+    fetcher = get_fetcher()
     
     # 测试平安银行
     symbol = "000001"
@@ -3,29 +3,361 @@
 使用DeepSeek进行AI驱动的分析
 包含：板块影响分析、股票推荐、风险评估、投资建议
 """
+import hashlib
 import json
 import logging
+import random
+import re
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from string import Template
 from typing import Dict, List, Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 多板块深度分析时同时发起的DeepSeek请求上限
+MAX_PARALLEL_SECTOR_CALLS = 5
+
+# 相同AI请求的响应缓存有效期（秒）
+RESPONSE_CACHE_TTL = 900
+
+# DeepSeek请求：同时在途上限、失败重试次数、退避基数与上限（秒）
+MAX_CONCURRENT_API_CALLS = 5
+API_MAX_RETRIES = 3
+API_RETRY_BASE_DELAY = 1.0
+API_RETRY_MAX_DELAY = 30.0
+
+# 可重试的失败类型（限流、超时、连接中断、服务端错误）
+# deepseek_client 捕获异常后只返回 "API调用失败: {异常信息}"，只能匹配文本；
+# 状态码按 openai 的 "Error code: 503" 格式匹配，避免命中 token 数、请求ID等数字
+_RETRYABLE_ERROR_RE = re.compile(
+    r'error code:?\s*(?:429|50[0-4])\b|too many requests|rate.?limit|timed?.?out|timeout'
+    r'|connection (?:error|reset|refused|aborted)|overloaded|server.?error',
+    re.I
+)
+
+# 板块关键词映射（板块识别、新闻/话题筛选、降级分析共用）
+SECTOR_KEYWORDS = {
+    'AI人工智能': ('AI', '人工智能', '大模型', 'ChatGPT', 'GPT', '算力', '智能', 'DeepSeek', '机器人'),
+    '新能源': ('新能源', '光伏', '锂电', '储能', '电池', '充电桩', '风电'),
+    '半导体芯片': ('芯片', '半导体', '光刻', '封装', '晶圆', '集成电路', '封测', '国产替代'),
+    '医药生物': ('医药', '生物', '疫苗', '创新药', '医疗', 'CXO'),
+    '消费': ('消费', '白酒', '食品', '零售', '餐饮', '旅游'),
+    '金融': ('银行', '保险', '券商', '证券', '金融', '信托'),
+    '房地产': ('房地产', '地产', '楼市', '房价'),
+    '军工': ('军工', '国防', '航空', '航天', '武器'),
+    '汽车': ('汽车', '新能源车', '智能驾驶', '无人驾驶'),
+    '低空经济': ('低空', '无人机', '飞行汽车', 'eVTOL'),
+    '机器人': ('机器人', '人形机器人', '工业机器人', '减速器'),
+    '数据要素': ('数据', '数据要素', '数据交易', '数字经济'),
+}
+
+# 每个板块的关键词编译为一个正则（任一关键词出现即匹配）
+SECTOR_PATTERNS = {
+    sector: re.compile('|'.join(map(re.escape, keywords)))
+    for sector, keywords in SECTOR_KEYWORDS.items()
+}
+
+
+# ==================== 提示词模板 ====================
+# 静态骨架只构建一次，每次调用仅替换 ${...} 占位
+
+_SECTOR_IMPACT_PROMPT = Template("""你是一名资深的A股短线投资分析师，专注于热点题材挖掘和板块轮动分析。
+
+【重要】请根据以下全网热点数据，进行深度的A股题材分析：
+
+=== 全网热门话题TOP20 ===
+${topics_text}
+
+=== 股票相关新闻TOP15 ===
+${news_text}
+${flow_info}
+
+请完成以下分析任务：
+
+1. **题材挖掘**：从以上热点中挖掘出可能引爆A股的核心题材概念
+2. **板块分析**：分析最可能受益的A股板块（要具体到申万行业或同花顺概念板块）
+3. **热度评估**：评估每个板块的潜在炒作热度和持续性
+4. **龙头预判**：推测可能的龙头股特征
+
+请以JSON格式输出：
+{
+    "hot_themes": [
+        {"theme": "题材名称", "source": "来源热点", "heat_level": "极高/高/中", "sustainability": "持续性评估"}
+    ],
+    "benefited_sectors": [
+        {
+            "name": "板块名称（要具体如：AI算力、低空经济、机器人等）",
+            "impact": "利好",
+            "confidence": 85,
+            "reason": "详细分析原因",
+            "related_concepts": ["相关概念1", "相关概念2"],
+            "leader_characteristics": "龙头股特征描述"
+        }
+    ],
+    "damaged_sectors": [
+        {"name": "板块名称", "impact": "利空", "confidence": 60, "reason": "原因"}
+    ],
+    "opportunity_assessment": "今日A股投资机会综合评估（100字以内）",
+    "trading_suggestion": "短线操作建议",
+    "key_points": ["核心要点1", "核心要点2", "核心要点3"]
+}
+
+只输出JSON，不要其他文字。""")
+
+_STOCK_RECOMMEND_PROMPT = Template("""你是一名资深的A股短线游资操盘手，专注于热点题材龙头股挖掘。
+
+=== 当前市场状态 ===
+- 流量阶段: ${flow_stage} 
+- 情绪状态: ${sentiment_class}
+- 相关概念: ${concepts_text}
+
+=== 热门受益板块分析 ===
+${sectors_text}
+
+=== 选股要求 ===
+请根据"流量为王"理念，推荐5-8只A股短线标的：
+
+选股法则（必须遵循）：
+1. **先涨为王**：优先选择已经启动、走势强势的股票
+2. **名字为王**：股票名称与热点高度相关（如AI概念选"智"字头）
+3. **龙头优先**：选择板块内最强势的龙头或人气股
+4. **题材纯正**：主业与热点题材高度相关
+5. **流通盘适中**：30-150亿市值为佳，便于资金操作
+
+请以JSON格式输出：
+{
+    "recommended_stocks": [
+        {
+            "code": "股票代码（6位数字，如000001或600001）",
+            "name": "股票名称",
+            "sector": "所属板块",
+            "market": "沪市/深市/创业板/科创板",
+            "market_cap": "市值（亿）",
+            "reason": "推荐理由（与热点的关联性）",
+            "catalyst": "催化剂/驱动因素",
+            "strategy": "操作策略（进场/加仓/止损建议）",
+            "target_space": "目标空间（如15-20%）",
+            "risk_level": "低/中/高",
+            "attention_points": ["注意事项1", "注意事项2"]
+        }
+    ],
+    "overall_strategy": "整体操作策略和仓位建议",
+    "timing_advice": "最佳介入时机判断",
+    "risk_warning": "风险提示（必须包含投资风险提醒）"
+}
+
+【重要】只推荐真实存在的A股股票，代码必须正确。只输出JSON。""")
+
+_RISK_ASSESS_PROMPT = Template("""你是一名专业的风险管理分析师。
+
+请根据以下市场数据评估当前投资风险：
+
+市场状态：
+- 流量阶段: ${flow_stage}
+- 情绪指数: ${sentiment_index}
+- 情绪分类: ${sentiment_class}
+- K值(病毒系数): ${viral_k}
+- 流量类型: ${flow_type}
+
+核心理念：
+- 流量高潮 = 价格高潮 = 逃命时刻
+- K值>1.5表示指数型爆发，风险上升
+- 情绪极端（>85或<20）都意味着风险
+
+请分析：
+1. 当前风险等级（极低/低/中等/高/极高）
+2. 主要风险因素
+3. 风险分数（0-100）
+4. 详细分析
+
+以JSON格式输出：
+{
+    "risk_level": "高",
+    "risk_score": 75,
+    "risk_factors": ["风险因素1", "风险因素2", ...],
+    "opportunities": ["机会1", "机会2", ...],
+    "analysis": "详细分析文字",
+    "key_warning": "最重要的警告"
+}
+
+只输出JSON。""")
+
+_INVESTMENT_ADVISOR_PROMPT = Template("""你是一名首席投资策略师，需要给出最终的投资建议。
+
+综合分析数据：
+
+【流量分析】
+- 流量得分: ${total_score}
+- 流量等级: ${flow_level}
+
+【情绪分析】
+- 情绪指数: ${sentiment_index}
+- 情绪分类: ${sentiment_class}
+- 流量阶段: ${flow_stage}
+
+【板块分析】
+- 受益板块: ${sectors_text}
+- 机会评估: ${opportunity_assessment}
+
+【股票推荐】
+- 推荐股票: ${stocks_text}
+
+【风险评估】
+- 风险等级: ${risk_level}
+- 风险分数: ${risk_score}
+- 主要风险: ${risk_factors}
+
+核心原则（流量为王）：
+- 流量高潮 = 价格高潮 = 逃命时刻
+- 当热搜、媒体报道、KOL转发同时达到高潮时，就是出货时机
+- 短线操作：快进快出，紧跟龙头
+
+请给出最终投资建议：
+1. 操作建议（买入/持有/观望/回避）
+2. 置信度（0-100）
+3. 综合总结
+4. 具体行动计划
+
+以JSON格式输出：
+{
+    "advice": "观望",
+    "confidence": 75,
+    "summary": "综合总结文字",
+    "action_plan": [
+        "行动1",
+        "行动2",
+        ...
+    ],${verbose_fields}
+    "key_message": "最重要的一句话"
+}
+
+只输出JSON。""")
+
+# 投资建议中界面/报告未使用的字段，仅 verbose 模式下要求输出
+_ADVISOR_VERBOSE_FIELDS = '''
+    "position_suggestion": "仓位建议",
+    "timing": "时机判断",'''
+
+_SECTOR_DEEP_PROMPT = Template("""你是${sector_name}板块的专业分析师。
+
+请对以下与${sector_name}相关的新闻进行深度分析：
+
+【相关新闻】
+${news_text}
+
+【相关热点话题】
+${topics_text}
+
+请分析：
+1. ${sector_name}板块当前的市场热度和关注度
+2. 驱动因素分析（政策/技术/资金/事件）
+3. 短期（1-3天）走势预判
+4. 核心龙头股分析（至少3只）
+5. 投资建议和风险提示
+
+以JSON格式输出：
+{
+    "sector_name": "${sector_name}",
+    "heat_level": "极高/高/中/低",
+    "heat_score": 85,
+    "drivers": [
+        {"type": "政策", "content": "具体驱动因素", "impact": "正面/负面"}
+    ],
+    "short_term_outlook": "看涨/震荡/看跌",
+    "outlook_reason": "预判理由",
+    "leader_stocks": [
+        {
+            "code": "600000",
+            "name": "股票名称",
+            "reason": "龙头理由",
+            "strategy": "操作策略"
+        }
+    ],
+    "investment_advice": "具体投资建议",
+    "risk_warning": "风险提示",
+    "key_indicators": {
+        "关注度": "高",
+        "资金流向": "净流入",
+        "情绪指数": 75
+    }
+}
+
+只输出JSON。""")
+
+
+def _extract_json(text: str) -> Optional[str]:
+    """
+    从AI响应中提取第一个完整的JSON对象文本
+    
+    跳过推理过程标记，若有markdown代码块则从代码块内开始查找；
+    从第一个 { 起单次扫描并计数括号深度（忽略字符串内的括号），
+    找到与之匹配的 } 即返回，不受JSON后附带文字的影响
+    
+    Returns:
+        JSON文本，未找到完整对象时返回None
+    """
+    # 移除可能的推理过程
+    idx = text.rfind('【推理过程】')
+    idx = idx + len('【推理过程】') if idx >= 0 else 0
+    
+    # 处理markdown代码块
+    fence = text.find('```', idx)
+    if fence >= 0:
+        idx = fence + 3
+    
+    start = text.find('{', idx)
+    if start < 0:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    
+    return None
+
 
 class NewsFlowAgents:
     """新闻流量智能分析代理"""
     
-    def __init__(self, model: str = None):
+    def __init__(self, model: str = None, verbose: bool = False):
         """
         初始化代理
         
         Args:
             model: 使用的模型，默认从 .env 的 DEFAULT_MODEL_NAME 读取
+            verbose: 是否要求AI输出仓位建议、时机判断等扩展字段
         """
         import config
         self.model = model or config.DEFAULT_MODEL_NAME
+        self.verbose = verbose
         self.deepseek_client = None
+        self._response_cache = {}  # {请求哈希: (时间戳, 响应文本)}
+        self._response_cache_lock = threading.Lock()
+        self._api_semaphore = threading.BoundedSemaphore(MAX_CONCURRENT_API_CALLS)
+        # 各类并行分析共用的线程池（按需创建，避免每次分析新建/销毁线程）
+        self._executor = None
+        self._executor_lock = threading.Lock()
         self._init_client()
     
     def _init_client(self):
@@ -42,6 +374,69 @@ class NewsFlowAgents:
         """检查AI是否可用"""
         return self.deepseek_client is not None
     
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取共享线程池"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=MAX_PARALLEL_SECTOR_CALLS,
+                        thread_name_prefix='news_flow_ai'
+                    )
+        return self._executor
+    
+    def _call_api(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        """
+        调用DeepSeek，相同请求在缓存有效期内直接返回上次结果
+        
+        缓存键为 消息+模型+参数 的SHA256，失败响应不缓存
+        """
+        key = hashlib.sha256(
+            json.dumps([self.model, temperature, max_tokens, messages], ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        
+        now = time.time()
+        with self._response_cache_lock:
+            cached = self._response_cache.get(key)
+            if cached and now - cached[0] < RESPONSE_CACHE_TTL:
+                logger.info("♻️ 命中AI响应缓存")
+                return cached[1]
+        
+        response = self._call_api_with_retry(messages, temperature, max_tokens)
+        
+        if response and not response.startswith("API调用失败") and response != "API返回空响应":
+            with self._response_cache_lock:
+                # 顺带清理过期条目，避免缓存无限增长
+                expired = [k for k, (ts, _) in self._response_cache.items() if now - ts >= RESPONSE_CACHE_TTL]
+                for k in expired:
+                    del self._response_cache[k]
+                self._response_cache[key] = (now, response)
+        
+        return response
+    
+    def _call_api_with_retry(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        """
+        调用DeepSeek，限流/超时/服务端错误时指数退避重试
+        
+        同时在途请求数受信号量限制，避免并行分析时触发接口限流
+        """
+        response = ""
+        for retry_count in range(API_MAX_RETRIES + 1):
+            with self._api_semaphore:
+                response = self.deepseek_client.call_api(messages, temperature=temperature, max_tokens=max_tokens)
+            
+            if not (response.startswith("API调用失败") and _RETRYABLE_ERROR_RE.search(response)):
+                return response
+            
+            if retry_count < API_MAX_RETRIES:
+                # 指数退避 + 随机抖动，避免多个并行请求同时重试
+                delay = min(API_RETRY_MAX_DELAY, API_RETRY_BASE_DELAY * 2 ** retry_count)
+                delay = random.uniform(delay / 2, delay)
+                logger.warning(f"DeepSeek请求失败，{delay:.1f}秒后重试 (第{retry_count + 1}次): {response[:100]}")
+                time.sleep(delay)
+        
+        return response
+    
     def sector_impact_agent(self, hot_topics: List[Dict], 
                             stock_news: List[Dict],
                             flow_data: Dict = None) -> Dict:
@@ -61,15 +456,15 @@ class NewsFlowAgents:
             return self._fallback_sector_analysis(hot_topics, stock_news)
         
         # 准备数据
-        topics_text = '\n'.join([
+        topics_text = '\n'.join(
             f"- {t['topic']} (热度:{t.get('heat', 0)}, 跨{t.get('cross_platform', 0)}平台)"
-            for t in hot_topics[:20]
-        ])
+            for t in islice(hot_topics, 20)
+        )
         
-        news_text = '\n'.join([
+        news_text = '\n'.join(
             f"- [{n.get('platform_name', '')}] {n.get('title', '')}"
-            for n in stock_news[:15]
-        ])
+            for n in islice(stock_news, 15)
+        )
         
         flow_info = ""
         if flow_data:
@@ -81,48 +476,11 @@ class NewsFlowAgents:
 - 财经平台热度: {flow_data.get('finance_score', 'N/A')}
 """
         
-        prompt = f"""你是一名资深的A股短线投资分析师，专注于热点题材挖掘和板块轮动分析。
-
-【重要】请根据以下全网热点数据，进行深度的A股题材分析：
-
-=== 全网热门话题TOP20 ===
-{topics_text}
-
-=== 股票相关新闻TOP15 ===
-{news_text}
-{flow_info}
-
-请完成以下分析任务：
-
-1. **题材挖掘**：从以上热点中挖掘出可能引爆A股的核心题材概念
-2. **板块分析**：分析最可能受益的A股板块（要具体到申万行业或同花顺概念板块）
-3. **热度评估**：评估每个板块的潜在炒作热度和持续性
-4. **龙头预判**：推测可能的龙头股特征
-
-请以JSON格式输出：
-{{
-    "hot_themes": [
-        {{"theme": "题材名称", "source": "来源热点", "heat_level": "极高/高/中", "sustainability": "持续性评估"}}
-    ],
-    "benefited_sectors": [
-        {{
-            "name": "板块名称（要具体如：AI算力、低空经济、机器人等）",
-            "impact": "利好",
-            "confidence": 85,
-            "reason": "详细分析原因",
-            "related_concepts": ["相关概念1", "相关概念2"],
-            "leader_characteristics": "龙头股特征描述"
-        }}
-    ],
-    "damaged_sectors": [
-        {{"name": "板块名称", "impact": "利空", "confidence": 60, "reason": "原因"}}
-    ],
-    "opportunity_assessment": "今日A股投资机会综合评估（100字以内）",
-    "trading_suggestion": "短线操作建议",
-    "key_points": ["核心要点1", "核心要点2", "核心要点3"]
-}}
-
-只输出JSON，不要其他文字。"""
+        prompt = _SECTOR_IMPACT_PROMPT.substitute(
+            topics_text=topics_text,
+            news_text=news_text,
+            flow_info=flow_info
+        )
 
         try:
             messages = [
@@ -130,7 +488,7 @@ class NewsFlowAgents:
                 {"role": "user", "content": prompt}
             ]
             
-            response = self.deepseek_client.call_api(messages, temperature=0.5, max_tokens=2000)
+            response = self._call_api(messages, temperature=0.5, max_tokens=2000)
             
             # 解析JSON
             result = self._parse_json_response(response)
@@ -172,59 +530,28 @@ class NewsFlowAgents:
         if not self.is_available():
             return self._fallback_stock_recommend(hot_sectors)
         
-        sectors_text = '\n'.join([
+        sectors_text = '\n'.join(
             f"- {s.get('name', '')}：{s.get('impact', '利好')}，置信度{s.get('confidence', 50)}%\n  原因：{s.get('reason', '')}\n  龙头特征：{s.get('leader_characteristics', 'N/A')}"
-            for s in hot_sectors[:5]
-        ])
-        
-        related_concepts = []
-        for s in hot_sectors[:5]:
-            related_concepts.extend(s.get('related_concepts', []))
-        concepts_text = ', '.join(list(set(related_concepts))[:10]) if related_concepts else '无'
+            for s in islice(hot_sectors, 5)
+        )
         
-        prompt = f"""你是一名资深的A股短线游资操盘手，专注于热点题材龙头股挖掘。
-
-=== 当前市场状态 ===
-- 流量阶段: {flow_stage} 
-- 情绪状态: {sentiment_class}
-- 相关概念: {concepts_text}
-
-=== 热门受益板块分析 ===
-{sectors_text}
-
-=== 选股要求 ===
-请根据"流量为王"理念，推荐5-8只A股短线标的：
-
-选股法则（必须遵循）：
-1. **先涨为王**：优先选择已经启动、走势强势的股票
-2. **名字为王**：股票名称与热点高度相关（如AI概念选"智"字头）
-3. **龙头优先**：选择板块内最强势的龙头或人气股
-4. **题材纯正**：主业与热点题材高度相关
-5. **流通盘适中**：30-150亿市值为佳，便于资金操作
-
-请以JSON格式输出：
-{{
-    "recommended_stocks": [
-        {{
-            "code": "股票代码（6位数字，如000001或600001）",
-            "name": "股票名称",
-            "sector": "所属板块",
-            "market": "沪市/深市/创业板/科创板",
-            "market_cap": "市值（亿）",
-            "reason": "推荐理由（与热点的关联性）",
-            "catalyst": "催化剂/驱动因素",
-            "strategy": "操作策略（进场/加仓/止损建议）",
-            "target_space": "目标空间（如15-20%）",
-            "risk_level": "低/中/高",
-            "attention_points": ["注意事项1", "注意事项2"]
-        }}
-    ],
-    "overall_strategy": "整体操作策略和仓位建议",
-    "timing_advice": "最佳介入时机判断",
-    "risk_warning": "风险提示（必须包含投资风险提醒）"
-}}
-
-【重要】只推荐真实存在的A股股票，代码必须正确。只输出JSON。"""
+        # 按出现顺序去重，取前10个相关概念
+        related_concepts = {}
+        for s in islice(hot_sectors, 5):
+            for concept in s.get('related_concepts') or ():
+                related_concepts.setdefault(concept, None)
+                if len(related_concepts) == 10:
+                    break
+            if len(related_concepts) == 10:
+                break
+        concepts_text = ', '.join(related_concepts) if related_concepts else '无'
+        
+        prompt = _STOCK_RECOMMEND_PROMPT.substitute(
+            flow_stage=flow_stage,
+            sentiment_class=sentiment_class,
+            concepts_text=concepts_text,
+            sectors_text=sectors_text
+        )
 
         try:
             messages = [
@@ -232,7 +559,7 @@ class NewsFlowAgents:
                 {"role": "user", "content": prompt}
             ]
             
-            response = self.deepseek_client.call_api(messages, temperature=0.6, max_tokens=2000)
+            response = self._call_api(messages, temperature=0.6, max_tokens=2000)
             result = self._parse_json_response(response)
             
             if result:
@@ -272,39 +599,13 @@ class NewsFlowAgents:
         if not self.is_available():
             return self._fallback_risk_assess(flow_stage, sentiment_data, viral_k)
         
-        prompt = f"""你是一名专业的风险管理分析师。
-
-请根据以下市场数据评估当前投资风险：
-
-市场状态：
-- 流量阶段: {flow_stage}
-- 情绪指数: {sentiment_data.get('sentiment_index', 50)}
-- 情绪分类: {sentiment_data.get('sentiment_class', '中性')}
-- K值(病毒系数): {viral_k}
-- 流量类型: {flow_type}
-
-核心理念：
-- 流量高潮 = 价格高潮 = 逃命时刻
-- K值>1.5表示指数型爆发，风险上升
-- 情绪极端（>85或<20）都意味着风险
-
-请分析：
-1. 当前风险等级（极低/低/中等/高/极高）
-2. 主要风险因素
-3. 风险分数（0-100）
-4. 详细分析
-
-以JSON格式输出：
-{{
-    "risk_level": "高",
-    "risk_score": 75,
-    "risk_factors": ["风险因素1", "风险因素2", ...],
-    "opportunities": ["机会1", "机会2", ...],
-    "analysis": "详细分析文字",
-    "key_warning": "最重要的警告"
-}}
-
-只输出JSON。"""
+        prompt = _RISK_ASSESS_PROMPT.substitute(
+            flow_stage=flow_stage,
+            sentiment_index=sentiment_data.get('sentiment_index', 50),
+            sentiment_class=sentiment_data.get('sentiment_class', '中性'),
+            viral_k=viral_k,
+            flow_type=flow_type
+        )
 
         try:
             messages = [
@@ -312,7 +613,7 @@ class NewsFlowAgents:
                 {"role": "user", "content": prompt}
             ]
             
-            response = self.deepseek_client.call_api(messages, temperature=0.4, max_tokens=1500)
+            response = self._call_api(messages, temperature=0.4, max_tokens=1500)
             result = self._parse_json_response(response)
             
             if result:
@@ -356,75 +657,38 @@ class NewsFlowAgents:
             return self._fallback_investment_advice(risk_assess, flow_data)
         
         # 构建综合信息
-        sectors_text = ', '.join([s.get('name', '') for s in sector_analysis.get('benefited_sectors', [])[:3]])
-        stocks_text = ', '.join([f"{s.get('name', '')}({s.get('code', '')})" 
-                                 for s in stock_recommend.get('recommended_stocks', [])[:3]])
-        
-        prompt = f"""你是一名首席投资策略师，需要给出最终的投资建议。
-
-综合分析数据：
-
-【流量分析】
-- 流量得分: {flow_data.get('total_score', 'N/A')}
-- 流量等级: {flow_data.get('level', 'N/A')}
-
-【情绪分析】
-- 情绪指数: {sentiment_data.get('sentiment_index', 50)}
-- 情绪分类: {sentiment_data.get('sentiment_class', '中性')}
-- 流量阶段: {sentiment_data.get('flow_stage', '未知')}
-
-【板块分析】
-- 受益板块: {sectors_text}
-- 机会评估: {sector_analysis.get('opportunity_assessment', 'N/A')}
-
-【股票推荐】
-- 推荐股票: {stocks_text}
-
-【风险评估】
-- 风险等级: {risk_assess.get('risk_level', '中等')}
-- 风险分数: {risk_assess.get('risk_score', 50)}
-- 主要风险: {', '.join(risk_assess.get('risk_factors', [])[:3])}
-
-核心原则（流量为王）：
-- 流量高潮 = 价格高潮 = 逃命时刻
-- 当热搜、媒体报道、KOL转发同时达到高潮时，就是出货时机
-- 短线操作：快进快出，紧跟龙头
-
-请给出最终投资建议：
-1. 操作建议（买入/持有/观望/回避）
-2. 置信度（0-100）
-3. 综合总结
-4. 具体行动计划
-
-以JSON格式输出：
-{{
-    "advice": "观望",
-    "confidence": 75,
-    "summary": "综合总结文字",
-    "action_plan": [
-        "行动1",
-        "行动2",
-        ...
-    ],
-    "position_suggestion": "仓位建议",
-    "timing": "时机判断",
-    "key_message": "最重要的一句话"
-}}
-
-只输出JSON。"""
+        sectors_text = ', '.join(s.get('name', '') for s in islice(sector_analysis.get('benefited_sectors', []), 3))
+        stocks_text = ', '.join(f"{s.get('name', '')}({s.get('code', '')})"
+                                for s in islice(stock_recommend.get('recommended_stocks', []), 3))
+        
+        prompt = _INVESTMENT_ADVISOR_PROMPT.substitute(
+            total_score=flow_data.get('total_score', 'N/A'),
+            flow_level=flow_data.get('level', 'N/A'),
+            sentiment_index=sentiment_data.get('sentiment_index', 50),
+            sentiment_class=sentiment_data.get('sentiment_class', '中性'),
+            flow_stage=sentiment_data.get('flow_stage', '未知'),
+            sectors_text=sectors_text,
+            opportunity_assessment=sector_analysis.get('opportunity_assessment', 'N/A'),
+            stocks_text=stocks_text,
+            risk_level=risk_assess.get('risk_level', '中等'),
+            risk_score=risk_assess.get('risk_score', 50),
+            risk_factors=', '.join(islice(risk_assess.get('risk_factors', []), 3)),
+            verbose_fields=_ADVISOR_VERBOSE_FIELDS if self.verbose else ''
+        )
 
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
             
             messages = [
                 {"role": "system", "content": "你是首席投资策略师，必须给出明确的投资建议，只输出纯JSON格式。"},
                 {"role": "user", "content": prompt}
             ]
             
-            response = self.deepseek_client.call_api(messages, temperature=0.5, max_tokens=2000)
+            # 只输出核心字段时回答较短，相应降低生成上限
+            response = self._call_api(messages, temperature=0.5, max_tokens=2000 if self.verbose else 800)
             result = self._parse_json_response(response)
             
-            analysis_time = time.time() - start_time
+            analysis_time = time.perf_counter() - start_time
             
             if result:
                 return {
@@ -465,33 +729,38 @@ class NewsFlowAgents:
                 'analysis_time': float,
             }
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         logger.info("🤖 开始AI分析...")
         
-        # 1. 板块影响分析
-        logger.info("  📊 分析板块影响...")
-        sector_analysis = self.sector_impact_agent(hot_topics, stock_news, flow_data)
-        
-        # 2. 股票推荐
-        logger.info("  📈 生成股票推荐...")
         flow_stage = sentiment_data.get('flow_stage', {}).get('stage_name', '未知')
         sentiment_class = sentiment_data.get('sentiment', {}).get('sentiment_class', '中性')
-        stock_recommend = self.stock_recommend_agent(
-            sector_analysis.get('benefited_sectors', []),
-            flow_stage,
-            sentiment_class
-        )
         
-        # 3. 风险评估
+        # 风险评估不依赖板块分析，与板块分析并行；股票推荐只依赖板块分析
+        executor = self._get_executor()
+        # 1. 板块影响分析 & 3. 风险评估（并行）
+        logger.info("  📊 分析板块影响...")
+        sector_future = executor.submit(self.sector_impact_agent, hot_topics, stock_news, flow_data)
         logger.info("  ⚠️ 评估风险...")
-        risk_assess = self.risk_assess_agent(
+        risk_future = executor.submit(
+            self.risk_assess_agent,
             flow_stage,
             sentiment_data.get('sentiment', {}),
             viral_k,
             flow_type
         )
         
+        # 2. 股票推荐（等待板块分析完成）
+        sector_analysis = sector_future.result()
+        logger.info("  📈 生成股票推荐...")
+        stock_recommend = self.stock_recommend_agent(
+            sector_analysis.get('benefited_sectors', []),
+            flow_stage,
+            sentiment_class
+        )
+        
+        risk_assess = risk_future.result()
+        
         # 4. 综合投资建议
         logger.info("  💡 生成投资建议...")
         investment_advice = self.investment_advisor_agent(
@@ -502,7 +771,7 @@ class NewsFlowAgents:
             sentiment_data.get('sentiment', {})
         )
         
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         logger.info(f"✅ AI分析完成，耗时 {total_time:.2f} 秒")
         
         # 汇总结果
@@ -518,7 +787,7 @@ class NewsFlowAgents:
                 investment_advice.get('success', False),
             ]),
             'analysis_time': round(total_time, 2),
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
         }
     
     def analyze_sector_deep(self, sector_name: str, related_news: List[Dict], 
@@ -531,61 +800,21 @@ class NewsFlowAgents:
         if not self.is_available():
             return {'success': False, 'error': 'AI不可用'}
         
-        news_text = '\n'.join([
+        news_text = '\n'.join(
             f"- [{n.get('platform_name', '')}] {n.get('title', '')}"
-            for n in related_news[:20]
-        ])
+            for n in islice(related_news, 20)
+        )
         
-        topics_text = '\n'.join([
+        topics_text = '\n'.join(
             f"- {t['topic']} (热度:{t.get('heat', 0)})"
-            for t in hot_topics[:10]
-        ])
+            for t in islice(hot_topics, 10)
+        )
         
-        prompt = f"""你是{sector_name}板块的专业分析师。
-
-请对以下与{sector_name}相关的新闻进行深度分析：
-
-【相关新闻】
-{news_text}
-
-【相关热点话题】
-{topics_text}
-
-请分析：
-1. {sector_name}板块当前的市场热度和关注度
-2. 驱动因素分析（政策/技术/资金/事件）
-3. 短期（1-3天）走势预判
-4. 核心龙头股分析（至少3只）
-5. 投资建议和风险提示
-
-以JSON格式输出：
-{{
-    "sector_name": "{sector_name}",
-    "heat_level": "极高/高/中/低",
-    "heat_score": 85,
-    "drivers": [
-        {{"type": "政策", "content": "具体驱动因素", "impact": "正面/负面"}}
-    ],
-    "short_term_outlook": "看涨/震荡/看跌",
-    "outlook_reason": "预判理由",
-    "leader_stocks": [
-        {{
-            "code": "600000",
-            "name": "股票名称",
-            "reason": "龙头理由",
-            "strategy": "操作策略"
-        }}
-    ],
-    "investment_advice": "具体投资建议",
-    "risk_warning": "风险提示",
-    "key_indicators": {{
-        "关注度": "高",
-        "资金流向": "净流入",
-        "情绪指数": 75
-    }}
-}}
-
-只输出JSON。"""
+        prompt = _SECTOR_DEEP_PROMPT.substitute(
+            sector_name=sector_name,
+            news_text=news_text,
+            topics_text=topics_text
+        )
 
         try:
             messages = [
@@ -593,7 +822,7 @@ class NewsFlowAgents:
                 {"role": "user", "content": prompt}
             ]
             
-            response = self.deepseek_client.call_api(messages, temperature=0.5, max_tokens=2000)
+            response = self._call_api(messages, temperature=0.5, max_tokens=2000)
             result = self._parse_json_response(response)
             
             if result:
@@ -630,7 +859,7 @@ class NewsFlowAgents:
         if not self.is_available():
             return {'success': False, 'error': 'AI不可用', 'sector_analyses': []}
         
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # 如果没有指定板块，先识别热门板块
         if not target_sectors:
@@ -638,23 +867,27 @@ class NewsFlowAgents:
         
         logger.info(f"🔍 开始分析 {len(target_sectors)} 个热门板块: {target_sectors}")
         
-        # 对每个板块进行深度分析
-        sector_analyses = []
-        for sector in target_sectors[:5]:  # 最多分析5个板块
+        # 对每个板块进行深度分析（各板块请求互不依赖，并行调用，最多分析5个板块）
+        sectors = target_sectors[:5]
+        
+        # 一次遍历新闻/话题，按板块归类相关内容
+        news_by_sector = self._index_news_by_sector(stock_news, sectors)
+        topics_by_sector = self._index_topics_by_sector(hot_topics, sectors)
+        
+        def analyze_one(sector: str) -> Dict:
             logger.info(f"  📊 分析板块: {sector}")
-            
-            # 筛选与该板块相关的新闻
-            related_news = self._filter_news_by_sector(stock_news, sector)
-            related_topics = self._filter_topics_by_sector(hot_topics, sector)
-            
-            analysis = self.analyze_sector_deep(sector, related_news, related_topics)
-            if analysis.get('success'):
-                sector_analyses.append(analysis)
+            return self.analyze_sector_deep(sector, news_by_sector[sector], topics_by_sector[sector])
+        
+        sector_analyses = []
+        if sectors:
+            for analysis in self._get_executor().map(analyze_one, sectors):
+                if analysis.get('success'):
+                    sector_analyses.append(analysis)
         
         # 生成综合总结
         summary = self._generate_multi_sector_summary(sector_analyses)
         
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         logger.info(f"✅ 多板块分析完成，耗时 {total_time:.2f} 秒")
         
         return {
@@ -668,97 +901,61 @@ class NewsFlowAgents:
     
     def _identify_hot_sectors(self, hot_topics: List[Dict], stock_news: List[Dict]) -> List[str]:
         """识别热门板块"""
-        # 板块关键词映射
-        sector_keywords = {
-            'AI人工智能': ['AI', '人工智能', '大模型', 'ChatGPT', '算力', '智能', 'DeepSeek', '机器人'],
-            '新能源': ['新能源', '光伏', '锂电', '储能', '电池', '充电桩', '风电'],
-            '半导体芯片': ['芯片', '半导体', '光刻', '封装', '晶圆', '国产替代'],
-            '医药生物': ['医药', '生物', '疫苗', '创新药', '医疗', 'CXO'],
-            '消费': ['消费', '白酒', '食品', '零售', '餐饮', '旅游'],
-            '金融': ['银行', '保险', '券商', '证券', '金融'],
-            '房地产': ['房地产', '地产', '楼市', '房价'],
-            '军工': ['军工', '国防', '航空', '航天', '武器'],
-            '汽车': ['汽车', '新能源车', '智能驾驶', '无人驾驶'],
-            '低空经济': ['低空', '无人机', '飞行汽车', 'eVTOL'],
-            '机器人': ['机器人', '人形机器人', '工业机器人', '减速器'],
-            '数据要素': ['数据', '数据要素', '数据交易', '数字经济'],
-        }
-        
         # 统计各板块的热度
         sector_scores = {}
         
         # 从话题中统计
         for topic in hot_topics:
             topic_text = topic.get('topic', '')
-            for sector, keywords in sector_keywords.items():
-                for kw in keywords:
-                    if kw in topic_text:
-                        sector_scores[sector] = sector_scores.get(sector, 0) + topic.get('heat', 1)
-                        break
+            for sector, pattern in SECTOR_PATTERNS.items():
+                if pattern.search(topic_text):
+                    sector_scores[sector] = sector_scores.get(sector, 0) + topic.get('heat', 1)
         
         # 从新闻中统计
         for news in stock_news:
             news_text = (news.get('title') or '') + (news.get('content') or '')
-            for sector, keywords in sector_keywords.items():
-                for kw in keywords:
-                    if kw in news_text:
-                        sector_scores[sector] = sector_scores.get(sector, 0) + news.get('weight', 1)
-                        break
+            for sector, pattern in SECTOR_PATTERNS.items():
+                if pattern.search(news_text):
+                    sector_scores[sector] = sector_scores.get(sector, 0) + news.get('weight', 1)
         
         # 按热度排序
         sorted_sectors = sorted(sector_scores.items(), key=lambda x: x[1], reverse=True)
         return [s[0] for s in sorted_sectors[:5]]
     
-    def _filter_news_by_sector(self, news_list: List[Dict], sector: str) -> List[Dict]:
-        """筛选与板块相关的新闻"""
-        sector_keywords = {
-            'AI人工智能': ['AI', '人工智能', '大模型', 'ChatGPT', '算力', '智能', 'DeepSeek', '机器人'],
-            '新能源': ['新能源', '光伏', '锂电', '储能', '电池', '充电桩', '风电'],
-            '半导体芯片': ['芯片', '半导体', '光刻', '封装', '晶圆'],
-            '医药生物': ['医药', '生物', '疫苗', '创新药', '医疗'],
-            '消费': ['消费', '白酒', '食品', '零售', '餐饮'],
-            '金融': ['银行', '保险', '券商', '证券', '金融'],
-            '房地产': ['房地产', '地产', '楼市'],
-            '军工': ['军工', '国防', '航空', '航天'],
-            '汽车': ['汽车', '新能源车', '智能驾驶'],
-            '低空经济': ['低空', '无人机', '飞行汽车'],
-            '机器人': ['机器人', '人形机器人', '减速器'],
-            '数据要素': ['数据', '数据要素', '数字经济'],
-        }
-        
-        keywords = sector_keywords.get(sector, [sector])
-        related = []
+    def _index_news_by_sector(self, news_list: List[Dict], sectors: List[str]) -> Dict[str, List[Dict]]:
+        """一次遍历新闻，按板块归类相关新闻（每个板块最多20条）"""
+        patterns = {sector: self._sector_pattern(sector) for sector in sectors}
+        related = {sector: [] for sector in sectors}
         
         for news in news_list:
             text = (news.get('title') or '') + (news.get('content') or '')
-            for kw in keywords:
-                if kw in text:
-                    related.append(news)
-                    break
+            for sector, pattern in patterns.items():
+                bucket = related[sector]
+                if len(bucket) < 20 and pattern.search(text):
+                    bucket.append(news)
         
-        return related[:20]
+        return related
     
-    def _filter_topics_by_sector(self, topics: List[Dict], sector: str) -> List[Dict]:
-        """筛选与板块相关的话题"""
-        sector_keywords = {
-            'AI人工智能': ['AI', '人工智能', '大模型', 'ChatGPT', '算力', '智能'],
-            '新能源': ['新能源', '光伏', '锂电', '储能', '电池'],
-            '半导体芯片': ['芯片', '半导体', '光刻'],
-            '医药生物': ['医药', '生物', '疫苗', '医疗'],
-            '消费': ['消费', '白酒', '食品', '餐饮'],
-        }
-        
-        keywords = sector_keywords.get(sector, [sector])
-        related = []
+    def _index_topics_by_sector(self, topics: List[Dict], sectors: List[str]) -> Dict[str, List[Dict]]:
+        """一次遍历话题，按板块归类相关话题（每个板块最多10条）"""
+        patterns = {sector: self._sector_pattern(sector) for sector in sectors}
+        related = {sector: [] for sector in sectors}
         
         for topic in topics:
             text = topic.get('topic', '')
-            for kw in keywords:
-                if kw in text:
-                    related.append(topic)
-                    break
+            for sector, pattern in patterns.items():
+                bucket = related[sector]
+                if len(bucket) < 10 and pattern.search(text):
+                    bucket.append(topic)
         
-        return related[:10]
+        return related
+    
+    def _sector_pattern(self, sector: str) -> re.Pattern:
+        """获取板块的关键词正则，未知板块按板块名本身匹配"""
+        pattern = SECTOR_PATTERNS.get(sector)
+        if pattern is None:
+            pattern = re.compile(re.escape(sector))
+        return pattern
     
     def _generate_multi_sector_summary(self, sector_analyses: List[Dict]) -> str:
         """生成多板块分析总结"""
@@ -785,27 +982,12 @@ class NewsFlowAgents:
     
     def _parse_json_response(self, response: str) -> Optional[Dict]:
         """解析JSON响应"""
+        if not response:
+            return None
+        
         try:
-            # 清理响应文本
-            text = response.strip()
-            
-            # 处理markdown代码块
-            if '```json' in text:
-                text = text.split('```json')[1].split('```')[0]
-            elif '```' in text:
-                text = text.split('```')[1].split('```')[0]
-            
-            # 移除可能的推理过程
-            if '【推理过程】' in text:
-                parts = text.split('【推理过程】')
-                text = parts[-1] if len(parts) > 1 else parts[0]
-            
-            # 查找JSON部分
-            start = text.find('{')
-            end = text.rfind('}') + 1
-            
-            if start >= 0 and end > start:
-                json_text = text[start:end]
+            json_text = _extract_json(response)
+            if json_text:
                 return json.loads(json_text)
             
             return None
@@ -820,21 +1002,12 @@ class NewsFlowAgents:
                                    stock_news: List[Dict]) -> Dict:
         """板块分析降级方法"""
         # 基于关键词的简单分析
-        sector_keywords = {
-            'AI人工智能': ['AI', '人工智能', 'ChatGPT', '大模型', '算力', 'GPT'],
-            '新能源': ['新能源', '锂电', '光伏', '风电', '储能', '充电桩'],
-            '半导体': ['芯片', '半导体', '光刻机', '集成电路', '封测'],
-            '医药生物': ['医药', '疫苗', '创新药', '医疗', '生物'],
-            '消费': ['消费', '白酒', '食品', '零售', '餐饮'],
-            '金融': ['银行', '保险', '券商', '金融', '信托'],
-        }
-        
         sector_hits = {}
         for topic in hot_topics:
             topic_text = topic.get('topic', '')
             heat = topic.get('heat', 0)
-            for sector, keywords in sector_keywords.items():
-                if any(kw in topic_text for kw in keywords):
+            for sector, pattern in SECTOR_PATTERNS.items():
+                if pattern.search(topic_text):
                     if sector not in sector_hits:
                         sector_hits[sector] = 0
                     sector_hits[sector] += heat
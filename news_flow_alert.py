@@ -2,13 +2,72 @@
 新闻流量预警系统模块
 实现6种预警类型和通知推送
 """
+import hashlib
+import json
 import logging
+import queue
+import threading
+import time
+from collections import defaultdict
 from datetime import datetime, timedelta
+from functools import cached_property
 from typing import Dict, List, Optional, Tuple
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 阈值配置缓存有效期（秒）
+THRESHOLD_CACHE_TTL = 60
+
+# 后台通知合并窗口（秒）：窗口内排队的预警合并为一条通知发送
+NOTIFY_BATCH_WINDOW = 0.5
+
+# 预警标题/内容模板
+ALERT_MESSAGE_TEMPLATES = {
+    'heat_surge': {
+        'title': '热度飙升预警：流量得分{score}',
+        'content': "当前流量得分{score}，超过阈值{threshold}。"
+                   "市场热度异常升高，可能存在短期机会，但也要注意追高风险。",
+    },
+    'rank_change': {
+        'title': '排名变化提示：{topics_text}',
+        'content': "{count}个话题排名快速上升（上升{threshold}名以上），"
+                   "可能是新热点正在发酵。",
+    },
+    'sentiment_high': {
+        'title': '情绪极值警告：{sentiment_class}({sentiment_index}分)',
+        'content': "情绪指数{sentiment_index}分，处于极度乐观状态！"
+                   "根据'流量高潮=价格高潮'理论，市场可能接近顶部，注意及时止盈。",
+    },
+    'sentiment_low': {
+        'title': '情绪极值警告：{sentiment_class}({sentiment_index}分)',
+        'content': "情绪指数{sentiment_index}分，处于极度悲观状态！"
+                   "市场恐慌情绪蔓延，可能存在超跌反弹机会，但需谨慎左侧布局。",
+    },
+    'flow_peak': {
+        'title': '⚠️ 流量高潮预警：准备跑路！',
+        'content': "流量阶段进入【{stage_name}】！这是最危险的信号！\n\n"
+                   "根据'流量为王'理论：流量高潮 = 价格高潮 = 逃命时刻\n\n"
+                   "当热搜、媒体报道、KOL转发同时达到高潮时，就是出货时机。\n\n"
+                   "建议：立即减仓或清仓，锁定利润！",
+    },
+    'flow_decline': {
+        'title': '流量退潮警告：及时止盈止损',
+        'content': "流量阶段进入【{stage_name}】，增速{avg_growth}%。\n\n"
+                   "题材热度正在消退，资金开始撤离。\n\n"
+                   "建议：持仓者及时止盈止损，不要恋战。空仓者不要抄底接飞刀。",
+    },
+    'viral_spread': {
+        'title': '病毒传播预警：K值={k_value}',
+        'content': "K值={k_value}，趋势：{trend}\n\n"
+                   "流量正在指数型增长，这是病毒式传播的特征。\n\n"
+                   "题材可能进入加速期，但也要注意：\n"
+                   "- K值过高意味着接近顶部的风险增加\n"
+                   "- 指数型增长往往伴随着指数型下跌\n"
+                   "- 密切关注后续K值变化，一旦开始下降就是离场信号",
+    },
+}
+
 
 class NewsFlowAlertSystem:
     """新闻流量预警系统"""
@@ -54,12 +113,15 @@ class NewsFlowAlertSystem:
         'danger': {'name': '危险', 'color': 'red', 'priority': 3},
     }
     
+    # 级别 -> 优先级（排序用）
+    _LEVEL_PRIORITY = {level: info['priority'] for level, info in ALERT_LEVELS.items()}
+    
+    # 阈值缓存（类级共享：界面修改阈值后，引擎/调度器中的实例同时失效）
+    _threshold_cache = None
+    _threshold_cache_time = 0
+    
     def __init__(self):
-        """初始化预警系统"""
-        self.db = None
-        self.notification_service = None
-        self._init_dependencies()
-        
+        """初始化预警系统（数据库、通知服务在首次使用时加载）"""
         # 默认阈值配置
         self.default_thresholds = {
             'heat_threshold': 800,
@@ -68,23 +130,69 @@ class NewsFlowAlertSystem:
             'sentiment_low_threshold': 20,
             'viral_k_threshold': 1.5,
         }
+        
+        # 上次检查的输入签名及结果（数据未变化时直接复用）
+        self._last_signature = None
+        self._last_alerts = []
+        
+        # 后台通知队列（首次异步发送时启动工作线程）
+        self._notify_queue = queue.Queue()
+        self._notify_thread = None
+        self._notify_lock = threading.Lock()
     
-    def _init_dependencies(self):
-        """初始化依赖"""
+    @cached_property
+    def db(self):
+        """新闻流量数据库（首次访问时导入）"""
         try:
             from news_flow_db import news_flow_db
-            self.db = news_flow_db
+            return news_flow_db
         except Exception as e:
             logger.warning(f"数据库初始化失败: {e}")
-        
+            return None
+    
+    @cached_property
+    def notification_service(self):
+        """通知服务（首次访问时导入）"""
         try:
             from notification_service import notification_service
-            self.notification_service = notification_service
+            return notification_service
         except Exception as e:
             logger.warning(f"通知服务初始化失败: {e}")
+            return None
+    
+    def _get_thresholds(self) -> Dict[str, float]:
+        """获取全部阈值配置（带缓存，数据库未配置的使用默认值）"""
+        now = time.time()
+        if self._threshold_cache is not None and now - self._threshold_cache_time < THRESHOLD_CACHE_TTL:
+            return self._threshold_cache
+        
+        configs = {}
+        if self.db:
+            try:
+                configs = self.db.get_all_alert_configs()
+            except Exception as e:
+                logger.warning(f"读取预警配置失败: {e}")
+        
+        thresholds = {}
+        for key, default in self.default_thresholds.items():
+            value = configs.get(key)
+            thresholds[key] = default
+            if value:
+                try:
+                    thresholds[key] = float(value)
+                except ValueError:
+                    pass
+        
+        NewsFlowAlertSystem._threshold_cache = thresholds
+        NewsFlowAlertSystem._threshold_cache_time = now
+        return thresholds
     
     def get_threshold(self, key: str) -> float:
         """获取阈值配置"""
+        thresholds = self._get_thresholds()
+        if key in thresholds:
+            return thresholds[key]
+        
         if self.db:
             value = self.db.get_alert_config(key)
             if value:
@@ -98,6 +206,7 @@ class NewsFlowAlertSystem:
         """设置阈值配置"""
         if self.db:
             self.db.set_alert_config(key, str(value))
+            NewsFlowAlertSystem._threshold_cache = None
     
     def check_alerts(self, current_data: Dict, 
                      history_data: Dict = None,
@@ -115,86 +224,99 @@ class NewsFlowAlertSystem:
         Returns:
             List[Dict]: 触发的预警列表
         """
-        alerts = []
+        thresholds = self._get_thresholds()
         
         flow_data = current_data.get('flow_data', {})
         hot_topics = current_data.get('hot_topics', [])
         viral_k = current_data.get('viral_k', {})
         flow_stage = current_data.get('flow_stage', {})
         
-        # 1. 检查热度飙升
-        heat_alert = self._check_heat_surge(flow_data)
-        if heat_alert:
-            heat_alert['snapshot_id'] = snapshot_id
-            alerts.append(heat_alert)
-        
-        # 2. 检查排名变化
-        if history_data:
-            rank_alert = self._check_rank_change(hot_topics, 
-                                                  history_data.get('hot_topics', []))
-            if rank_alert:
-                rank_alert['snapshot_id'] = snapshot_id
-                alerts.append(rank_alert)
-        
-        # 3. 检查情绪极值
-        if sentiment_data:
-            sentiment_alert = self._check_sentiment_extreme(sentiment_data)
-            if sentiment_alert:
-                sentiment_alert['snapshot_id'] = snapshot_id
-                alerts.append(sentiment_alert)
-        
-        # 4. 检查流量高潮（一致阶段）
-        peak_alert = self._check_flow_peak(flow_stage, sentiment_data)
-        if peak_alert:
-            peak_alert['snapshot_id'] = snapshot_id
-            alerts.append(peak_alert)
-        
-        # 5. 检查流量退潮
-        decline_alert = self._check_flow_decline(flow_stage)
-        if decline_alert:
-            decline_alert['snapshot_id'] = snapshot_id
-            alerts.append(decline_alert)
-        
-        # 6. 检查病毒传播
-        viral_alert = self._check_viral_spread(viral_k)
-        if viral_alert:
-            viral_alert['snapshot_id'] = snapshot_id
-            alerts.append(viral_alert)
+        # 预警相关输入与上次完全相同时（如非交易时段轮询），复用上次结果，不重复检查。
+        # 返回副本并标注当前快照ID；同一预警只在首次触发时入库，id仍指向那条记录，
+        # 持续不变的行情不会为每个快照重复写入预警和重复通知
+        signature = self._alert_signature(thresholds, flow_data, hot_topics, viral_k,
+                                          flow_stage, history_data, sentiment_data)
+        if signature == self._last_signature:
+            logger.info("预警输入未变化，复用上次检查结果")
+            return [dict(alert, snapshot_id=snapshot_id) for alert in self._last_alerts]
+        
+        # 各项检查：(检查方法, 参数)，缺少所需数据的检查不参与
+        checks = [
+            # 1. 检查热度飙升
+            (self._check_heat_surge, (flow_data, thresholds, snapshot_id)),
+            # 2. 检查排名变化
+            (self._check_rank_change, (hot_topics, history_data.get('hot_topics', []), thresholds, snapshot_id))
+            if history_data else None,
+            # 3. 检查情绪极值
+            (self._check_sentiment_extreme, (sentiment_data, thresholds, snapshot_id)) if sentiment_data else None,
+            # 4. 检查流量高潮（一致阶段）
+            (self._check_flow_peak, (flow_stage, sentiment_data, snapshot_id)),
+            # 5. 检查流量退潮
+            (self._check_flow_decline, (flow_stage, snapshot_id)),
+            # 6. 检查病毒传播
+            (self._check_viral_spread, (viral_k, thresholds, snapshot_id)),
+        ]
+        
+        alerts = [alert for alert in (func(*args) for func, args in filter(None, checks)) if alert]
         
         # 按优先级排序
-        alerts.sort(key=lambda x: self.ALERT_LEVELS.get(
-            x.get('alert_level', 'info'), {}
-        ).get('priority', 0), reverse=True)
+        level_priority = self._LEVEL_PRIORITY
+        alerts.sort(key=lambda x: level_priority.get(x.get('alert_level', 'info'), 0), reverse=True)
         
-        # 保存预警到数据库
+        # 保存预警到数据库（单个事务），记录ID以便发送通知后标记
         if self.db and alerts:
-            for alert in alerts:
-                self.db.save_alert(alert)
+            for alert, alert_id in zip(alerts, self.db.save_alerts(alerts)):
+                alert['id'] = alert_id
+        
+        self._last_signature = signature
+        self._last_alerts = alerts
         
         return alerts
     
-    def _check_heat_surge(self, flow_data: Dict) -> Optional[Dict]:
+    def _alert_signature(self, thresholds: Dict, flow_data: Dict, hot_topics: List[Dict],
+                         viral_k: Dict, flow_stage: Dict,
+                         history_data: Dict = None, sentiment_data: Dict = None) -> str:
+        """计算预警检查所用输入的签名（只包含各检查实际读取的字段）"""
+        sentiment = (sentiment_data or {}).get('sentiment', {})
+        key = [
+            thresholds,
+            flow_data.get('total_score', 0),
+            [t.get('topic', '') for t in hot_topics[:20]],
+            [t.get('topic', '') for t in history_data.get('hot_topics', [])] if history_data else None,
+            [sentiment.get('sentiment_index', 50), sentiment.get('sentiment_class', '中性')] if sentiment_data else None,
+            [flow_stage.get('stage', ''), flow_stage.get('stage_name', ''), flow_stage.get('avg_growth', 0)],
+            [viral_k.get('k_value', 1.0), viral_k.get('trend', '')],
+        ]
+        return hashlib.sha1(
+            json.dumps(key, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+    
+    def _check_heat_surge(self, flow_data: Dict, thresholds: Dict,
+                          snapshot_id: int = None) -> Optional[Dict]:
         """检查热度飙升"""
-        threshold = self.get_threshold('heat_threshold')
+        threshold = thresholds['heat_threshold']
         current_score = flow_data.get('total_score', 0)
         
         if current_score >= threshold:
+            template = ALERT_MESSAGE_TEMPLATES['heat_surge']
             return {
                 'alert_type': 'heat_surge',
                 'alert_level': 'warning',
-                'title': f'热度飙升预警：流量得分{current_score}',
-                'content': f"当前流量得分{current_score}，超过阈值{threshold}。"
-                           f"市场热度异常升高，可能存在短期机会，但也要注意追高风险。",
+                'title': template['title'].format(score=current_score),
+                'content': template['content'].format(score=current_score, threshold=threshold),
                 'related_topics': [],
                 'trigger_value': current_score,
                 'threshold_value': threshold,
+                'snapshot_id': snapshot_id,
             }
         return None
     
     def _check_rank_change(self, current_topics: List[Dict], 
-                           previous_topics: List[Dict]) -> Optional[Dict]:
+                           previous_topics: List[Dict],
+                           thresholds: Dict,
+                           snapshot_id: int = None) -> Optional[Dict]:
         """检查排名变化"""
-        threshold = int(self.get_threshold('rank_change_threshold'))
+        threshold = int(thresholds['rank_change_threshold'])
         
         if not previous_topics:
             return None
@@ -218,53 +340,52 @@ class NewsFlowAlertSystem:
         
         if rapid_rise_topics:
             topics_text = ', '.join([t['topic'] for t in rapid_rise_topics[:3]])
+            template = ALERT_MESSAGE_TEMPLATES['rank_change']
             return {
                 'alert_type': 'rank_change',
                 'alert_level': 'info',
-                'title': f'排名变化提示：{topics_text}',
-                'content': f"{len(rapid_rise_topics)}个话题排名快速上升（上升{threshold}名以上），"
-                           f"可能是新热点正在发酵。",
+                'title': template['title'].format(topics_text=topics_text),
+                'content': template['content'].format(count=len(rapid_rise_topics), threshold=threshold),
                 'related_topics': [t['topic'] for t in rapid_rise_topics],
                 'trigger_value': len(rapid_rise_topics),
                 'threshold_value': threshold,
+                'snapshot_id': snapshot_id,
             }
         return None
     
-    def _check_sentiment_extreme(self, sentiment_data: Dict) -> Optional[Dict]:
+    def _check_sentiment_extreme(self, sentiment_data: Dict, thresholds: Dict,
+                                 snapshot_id: int = None) -> Optional[Dict]:
         """检查情绪极值"""
-        high_threshold = self.get_threshold('sentiment_high_threshold')
-        low_threshold = self.get_threshold('sentiment_low_threshold')
+        high_threshold = thresholds['sentiment_high_threshold']
+        low_threshold = thresholds['sentiment_low_threshold']
         
         sentiment = sentiment_data.get('sentiment', {})
         sentiment_index = sentiment.get('sentiment_index', 50)
         sentiment_class = sentiment.get('sentiment_class', '中性')
         
         if sentiment_index >= high_threshold:
-            return {
-                'alert_type': 'sentiment_extreme',
-                'alert_level': 'warning',
-                'title': f'情绪极值警告：{sentiment_class}({sentiment_index}分)',
-                'content': f"情绪指数{sentiment_index}分，处于极度乐观状态！"
-                           f"根据'流量高潮=价格高潮'理论，市场可能接近顶部，注意及时止盈。",
-                'related_topics': [],
-                'trigger_value': sentiment_index,
-                'threshold_value': high_threshold,
-            }
+            template = ALERT_MESSAGE_TEMPLATES['sentiment_high']
+            threshold = high_threshold
         elif sentiment_index <= low_threshold:
-            return {
-                'alert_type': 'sentiment_extreme',
-                'alert_level': 'warning',
-                'title': f'情绪极值警告：{sentiment_class}({sentiment_index}分)',
-                'content': f"情绪指数{sentiment_index}分，处于极度悲观状态！"
-                           f"市场恐慌情绪蔓延，可能存在超跌反弹机会，但需谨慎左侧布局。",
-                'related_topics': [],
-                'trigger_value': sentiment_index,
-                'threshold_value': low_threshold,
-            }
-        return None
+            template = ALERT_MESSAGE_TEMPLATES['sentiment_low']
+            threshold = low_threshold
+        else:
+            return None
+        
+        return {
+            'alert_type': 'sentiment_extreme',
+            'alert_level': 'warning',
+            'title': template['title'].format(sentiment_class=sentiment_class, sentiment_index=sentiment_index),
+            'content': template['content'].format(sentiment_index=sentiment_index),
+            'related_topics': [],
+            'trigger_value': sentiment_index,
+            'threshold_value': threshold,
+            'snapshot_id': snapshot_id,
+        }
     
     def _check_flow_peak(self, flow_stage: Dict, 
-                          sentiment_data: Dict = None) -> Optional[Dict]:
+                          sentiment_data: Dict = None,
+                          snapshot_id: int = None) -> Optional[Dict]:
         """
         检查流量高潮（逃命预警）
         
@@ -290,17 +411,15 @@ class NewsFlowAlertSystem:
         return {
             'alert_type': 'flow_peak',
             'alert_level': 'danger',
-            'title': '⚠️ 流量高潮预警：准备跑路！',
-            'content': f"流量阶段进入【{stage_name}】！这是最危险的信号！\n\n"
-                       f"根据'流量为王'理论：流量高潮 = 价格高潮 = 逃命时刻\n\n"
-                       f"当热搜、媒体报道、KOL转发同时达到高潮时，就是出货时机。\n\n"
-                       f"建议：立即减仓或清仓，锁定利润！",
+            'title': ALERT_MESSAGE_TEMPLATES['flow_peak']['title'],
+            'content': ALERT_MESSAGE_TEMPLATES['flow_peak']['content'].format(stage_name=stage_name),
             'related_topics': [],
             'trigger_value': stage_name,
             'threshold_value': '一致阶段',
+            'snapshot_id': snapshot_id,
         }
     
-    def _check_flow_decline(self, flow_stage: Dict) -> Optional[Dict]:
+    def _check_flow_decline(self, flow_stage: Dict, snapshot_id: int = None) -> Optional[Dict]:
         """检查流量退潮"""
         stage = flow_stage.get('stage', '')
         stage_name = flow_stage.get('stage_name', '')
@@ -312,38 +431,76 @@ class NewsFlowAlertSystem:
         return {
             'alert_type': 'flow_decline',
             'alert_level': 'warning',
-            'title': f'流量退潮警告：及时止盈止损',
-            'content': f"流量阶段进入【{stage_name}】，增速{avg_growth}%。\n\n"
-                       f"题材热度正在消退，资金开始撤离。\n\n"
-                       f"建议：持仓者及时止盈止损，不要恋战。空仓者不要抄底接飞刀。",
+            'title': ALERT_MESSAGE_TEMPLATES['flow_decline']['title'],
+            'content': ALERT_MESSAGE_TEMPLATES['flow_decline']['content'].format(
+                stage_name=stage_name, avg_growth=avg_growth
+            ),
             'related_topics': [],
             'trigger_value': avg_growth,
             'threshold_value': '退潮阶段',
+            'snapshot_id': snapshot_id,
         }
     
-    def _check_viral_spread(self, viral_k: Dict) -> Optional[Dict]:
+    def _check_viral_spread(self, viral_k: Dict, thresholds: Dict,
+                            snapshot_id: int = None) -> Optional[Dict]:
         """检查病毒传播"""
-        threshold = self.get_threshold('viral_k_threshold')
+        threshold = thresholds['viral_k_threshold']
         k_value = viral_k.get('k_value', 1.0)
         trend = viral_k.get('trend', '')
         
         if k_value >= threshold:
+            template = ALERT_MESSAGE_TEMPLATES['viral_spread']
             return {
                 'alert_type': 'viral_spread',
                 'alert_level': 'warning',
-                'title': f'病毒传播预警：K值={k_value}',
-                'content': f"K值={k_value}，趋势：{trend}\n\n"
-                           f"流量正在指数型增长，这是病毒式传播的特征。\n\n"
-                           f"题材可能进入加速期，但也要注意：\n"
-                           f"- K值过高意味着接近顶部的风险增加\n"
-                           f"- 指数型增长往往伴随着指数型下跌\n"
-                           f"- 密切关注后续K值变化，一旦开始下降就是离场信号",
+                'title': template['title'].format(k_value=k_value),
+                'content': template['content'].format(k_value=k_value, trend=trend),
                 'related_topics': [],
                 'trigger_value': k_value,
                 'threshold_value': threshold,
+                'snapshot_id': snapshot_id,
             }
         return None
     
+    def send_notification_async(self, alerts: List[Dict]):
+        """
+        异步发送通知：放入队列后立即返回，由后台线程发送
+        
+        调用方（如预警生成任务）不必等待邮件/Webhook等网络请求完成
+        """
+        if not alerts:
+            return
+        
+        with self._notify_lock:
+            if self._notify_thread is None or not self._notify_thread.is_alive():
+                self._notify_thread = threading.Thread(
+                    target=self._notify_worker, name='news_flow_notify', daemon=True
+                )
+                self._notify_thread.start()
+        
+        self._notify_queue.put(list(alerts))
+    
+    def _notify_worker(self):
+        """后台通知线程：合并短时间内排队的预警后统一发送"""
+        while True:
+            alerts = self._notify_queue.get()
+            
+            # 合并窗口内陆续到达的预警，避免连续发送多条通知
+            deadline = time.time() + NOTIFY_BATCH_WINDOW
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    alerts.extend(self._notify_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                self.send_notification(alerts)
+            except Exception as e:
+                logger.error(f"后台发送通知失败: {e}")
+    
     def send_notification(self, alerts: List[Dict]) -> bool:
         """
         发送通知
@@ -361,34 +518,40 @@ class NewsFlowAlertSystem:
             logger.warning("通知服务不可用")
             return False
         
+        # 跳过已通知过的预警（如输入未变化时复用的上次预警）
+        alerts = [a for a in alerts if not a.get('is_notified')]
+        if not alerts:
+            return True
+        
         try:
-            # 按级别分组
-            danger_alerts = [a for a in alerts if a.get('alert_level') == 'danger']
-            warning_alerts = [a for a in alerts if a.get('alert_level') == 'warning']
-            info_alerts = [a for a in alerts if a.get('alert_level') == 'info']
+            # 按级别分组（单次遍历）
+            buckets = defaultdict(list)
+            for alert in alerts:
+                buckets[alert.get('alert_level')].append(alert['title'])
+            danger_alerts = buckets['danger']
+            warning_alerts = buckets['warning']
+            info_alerts = buckets['info']
             
             # 构建通知内容
-            lines = []
-            lines.append("📊 新闻流量预警通知")
-            lines.append(f"时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            lines.append("")
+            lines = [
+                "📊 新闻流量预警通知",
+                f"时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                "",
+            ]
             
             if danger_alerts:
                 lines.append("🔴 【危险预警】")
-                for alert in danger_alerts:
-                    lines.append(f"  • {alert['title']}")
+                lines.extend(f"  • {title}" for title in danger_alerts)
                 lines.append("")
             
             if warning_alerts:
                 lines.append("🟠 【警告】")
-                for alert in warning_alerts:
-                    lines.append(f"  • {alert['title']}")
+                lines.extend(f"  • {title}" for title in warning_alerts)
                 lines.append("")
             
             if info_alerts:
                 lines.append("🔵 【提示】")
-                for alert in info_alerts:
-                    lines.append(f"  • {alert['title']}")
+                lines.extend(f"  • {title}" for title in info_alerts)
             
             message = '\n'.join(lines)
             
@@ -406,10 +569,11 @@ class NewsFlowAlertSystem:
             )
             
             # 标记为已通知
-            if success and self.db:
+            if success:
                 for alert in alerts:
-                    if 'id' in alert:
-                        self.db.mark_alert_notified(alert['id'])
+                    alert['is_notified'] = 1
+                if self.db:
+                    self.db.mark_alerts_notified([alert['id'] for alert in alerts if 'id' in alert])
             
             return success
             
@@ -432,22 +596,22 @@ class NewsFlowAlertSystem:
     
     def get_alert_summary(self, days: int = 7) -> Dict:
         """获取预警统计摘要"""
-        alerts = self.get_alert_history(days)
+        # 在数据库中按类型+级别聚合，再汇总两个维度
+        rows = self.db.get_alert_counts(days) if self.db else []
         
-        # 按类型统计
         type_counts = {}
-        for alert in alerts:
-            alert_type = alert.get('alert_type', 'unknown')
-            type_counts[alert_type] = type_counts.get(alert_type, 0) + 1
-        
-        # 按级别统计
         level_counts = {}
-        for alert in alerts:
-            level = alert.get('alert_level', 'info')
-            level_counts[level] = level_counts.get(level, 0) + 1
+        total_count = 0
+        for row in rows:
+            alert_type = row['alert_type'] or 'unknown'
+            level = row['alert_level'] or 'info'
+            count = row['count']
+            type_counts[alert_type] = type_counts.get(alert_type, 0) + count
+            level_counts[level] = level_counts.get(level, 0) + count
+            total_count += count
         
         return {
-            'total_count': len(alerts),
+            'total_count': total_count,
             'type_counts': type_counts,
             'level_counts': level_counts,
             'danger_count': level_counts.get('danger', 0),
@@ -456,14 +620,8 @@ class NewsFlowAlertSystem:
         }
     
     def get_threshold_config(self) -> Dict:
-        """获取所有阈值配置"""
-        return {
-            'heat_threshold': self.get_threshold('heat_threshold'),
-            'rank_change_threshold': self.get_threshold('rank_change_threshold'),
-            'sentiment_high_threshold': self.get_threshold('sentiment_high_threshold'),
-            'sentiment_low_threshold': self.get_threshold('sentiment_low_threshold'),
-            'viral_k_threshold': self.get_threshold('viral_k_threshold'),
-        }
+        """获取所有阈值配置（界面轮询读取缓存，最多每 THRESHOLD_CACHE_TTL 秒查询一次数据库）"""
+        return dict(self._get_thresholds())
 
 
 # 全局实例
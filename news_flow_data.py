@@ -3,25 +3,138 @@
 用于获取各大平台的热点新闻和流量数据
 支持22个平台，包含排名、K值计算等功能
 """
+import json
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
+import heapq
+import re
+import threading
 import time
-from collections import Counter
+from collections import Counter, defaultdict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 多平台并发获取的最大线程数（同一接口，限制并发避免触发限流）
+MAX_PARALLEL_FETCHES = 8
+
+# 各类平台成功结果的缓存时间（秒），热榜几分钟才变化一次
+PLATFORM_CACHE_TTL = {
+    'finance': 60,
+    'social': 90,
+    'news': 120,
+    'tech': 300,
+}
+DEFAULT_CACHE_TTL = 120
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=8)
+def _compile_keywords(keywords: Tuple[str, ...]) -> 're.Pattern':
+    """把关键词编译成一个正则，用于一次扫描判断文本是否命中任一关键词"""
+    return re.compile('|'.join(map(re.escape, dict.fromkeys(keywords))))
+
+
+_jieba_warmup_thread = None
+
+
+def _import_jieba():
+    """优先使用C加速的jieba_fast（接口和词典与jieba相同），未安装时回退到jieba"""
+    try:
+        import jieba_fast as jieba
+    except ImportError:
+        import jieba
+    return jieba
+
+
+def _warm_up_jieba():
+    """后台加载jieba词典，与网络获取阶段重叠，分析时无需等待"""
+    try:
+        _import_jieba().initialize()
+    except Exception as e:
+        logger.warning(f"jieba预加载失败: {e}")
+
+
+def _start_jieba_warmup():
+    """进程内只启动一次词典预加载线程"""
+    global _jieba_warmup_thread
+    if _jieba_warmup_thread is None:
+        _jieba_warmup_thread = threading.Thread(target=_warm_up_jieba, daemon=True)
+        _jieba_warmup_thread.start()
+
 
 class NewsFlowDataFetcher:
     """新闻流量数据获取器"""
     
+    # 默认股票相关关键词
+    DEFAULT_STOCK_KEYWORDS = (
+        # 股市基础词汇
+        '股', '股市', '股票', 'A股', '港股', '美股', '创业板', '科创板', '北交所',
+        '涨停', '跌停', '大涨', '暴涨', '飙升', '暴跌', '涨幅', '跌幅', '翻倍',
+        '概念股', '龙头股', '妖股', '题材股', '白马股', '蓝筹股', '成长股',
+        '上市', 'IPO', '重组', '并购', '收购', '增发', '回购', '减持', '增持',
+        '业绩', '财报', '利好', '利空', '预增', '预减', '盈利', '亏损',
+        '牛市', '熊市', '反弹', '回调', '震荡', '突破', '新高',
+        '主力', '游资', '北向资金', '外资', '机构', '资金流入', '资金流出',
+        '板块', '行业', '赛道', '题材', '轮动', '热点',
+        
+        # 热门板块关键词
+        '芯片', '半导体', '光刻机', '封装', '存储',
+        '新能源', '锂电', '光伏', '储能', '风电', '氢能',
+        'AI', '人工智能', '大模型', 'ChatGPT', 'DeepSeek', '算力', 'GPU',
+        '机器人', '人形机器人', '工业机器人', '减速器', '伺服电机',
+        '低空经济', '无人机', 'eVTOL', '飞行汽车',
+        '数据要素', '数字经济', '信创', '国产替代',
+        '医药', '创新药', 'CXO', '医疗器械', '中药',
+        '消费', '白酒', '食品', '旅游', '免税',
+        '军工', '国防', '航空', '航天', '船舶',
+        '汽车', '新能源车', '智能驾驶', '无人驾驶', '充电桩',
+        '地产', '房地产', '楼市', '房价',
+        '金融', '银行', '保险', '券商', '证券',
+        
+        # 政策相关
+        '政策', '利率', '降息', '降准', '货币政策', '财政政策',
+        '国常会', '证监会', '央行', '发改委', '工信部',
+    )
+    
+    # 停用词（过滤无意义的词）
+    STOP_WORDS = frozenset({
+        '的', '是', '在', '了', '和', '与', '等', '为', '将', '被',
+        '有', '一', '个', '上', '下', '中', '大', '新', '年', '月', '日',
+        '这', '那', '其', '之', '也', '要', '就', '不', '我', '你', '他',
+        '来', '去', '到', '说', '会', '能', '都', '对', '着', '让',
+        '从', '以', '及', '或', '如', '还', '没', '很', '更', '最',
+    })
+    
+    # 平台结果缓存: platform -> (获取时刻, 结果)
+    # 类级共享，界面各处新建的获取器可复用引擎刚获取的数据
+    _cache = {}
+    
     def __init__(self):
         # self.base_url = "https://newsapi.ws4.cn/api/v1/dailynews/"
         self.base_url = "https://orz.ai/api/v1/dailynews/"
         self.timeout = 10
         
+        # 复用连接的会话：所有平台请求同一主机，避免每次重新握手
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=MAX_PARALLEL_FETCHES * 4,
+            max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # 后台预加载jieba词典，供get_hot_topics使用
+        _start_jieba_warmup()
+        
         # 支持的平台配置 - 扩展到22个平台
         self.platforms = {
             # 社交媒体平台（核心流量指标）- 8个
@@ -55,6 +168,11 @@ class NewsFlowDataFetcher:
             'juejin': {'name': '掘金', 'category': 'tech', 'weight': 5, 'influence': 'low'},
         }
         
+        # 类别 -> 平台代码列表（按配置顺序）
+        self._by_category = {}
+        for code, info in self.platforms.items():
+            self._by_category.setdefault(info['category'], []).append(code)
+        
         # 平台类别权重（用于转化率计算）
         self.category_weights = {
             'finance': 1.5,    # 财经平台转化率高
@@ -62,15 +180,23 @@ class NewsFlowDataFetcher:
             'news': 1.0,       # 新闻媒体正常
             'tech': 0.8,       # 科技平台相关性低
         }
-        
-        # 停用词（过滤无意义的词）
-        self.stop_words = {
-            '的', '是', '在', '了', '和', '与', '等', '为', '将', '被',
-            '有', '一', '个', '上', '下', '中', '大', '新', '年', '月', '日',
-            '这', '那', '其', '之', '也', '要', '就', '不', '我', '你', '他',
-            '来', '去', '到', '说', '会', '能', '都', '对', '着', '让',
-            '从', '以', '及', '或', '如', '还', '没', '很', '更', '最',
-        }
+    
+    def close(self):
+        """释放HTTP连接池"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def invalidate(self, platform: str = None):
+        """清除平台结果缓存，platform为None时清除全部"""
+        if platform is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(platform, None)
     
     def get_platform_news(self, platform: str) -> Dict:
         """
@@ -93,25 +219,31 @@ class NewsFlowDataFetcher:
                 'error': str (如果失败)
             }
         """
+        platform_info = self.platforms.get(platform, {})
+        ttl = PLATFORM_CACHE_TTL.get(platform_info.get('category'), DEFAULT_CACHE_TTL)
+        cached = self._cache.get(platform)
+        if cached and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+        
         try:
             url = f"{self.base_url}?platform={platform}"
             
             logger.info(f"正在获取 {platform} 平台数据...")
-            response = requests.get(url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
             
-            data = response.json()
+            # 直接解析原始字节（json自动识别UTF编码），跳过requests的字符集探测
+            data = json.loads(response.content)
             
             if data.get('status') == '200':
                 news_list = data.get('data', [])
-                platform_info = self.platforms.get(platform, {})
                 
                 # 为每条新闻添加排名信息
                 for i, news in enumerate(news_list):
                     news['rank'] = i + 1
                     news['platform'] = platform
                 
-                return {
+                result = {
                     'success': True,
                     'platform': platform,
                     'platform_name': platform_info.get('name', platform),
@@ -122,6 +254,8 @@ class NewsFlowDataFetcher:
                     'count': len(news_list),
                     'fetch_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 }
+                self._cache[platform] = (time.monotonic(), result)
+                return result
             else:
                 return {
                     'success': False,
@@ -149,13 +283,15 @@ class NewsFlowDataFetcher:
             }
     
     def get_multi_platform_news(self, platforms: List[str] = None, 
-                                 category: str = None) -> Dict:
+                                 category: str = None,
+                                 min_weight: int = 0) -> Dict:
         """
         获取多个平台的新闻数据
         
         Args:
             platforms: 平台列表，None表示获取所有
             category: 按类别筛选（'social', 'news', 'finance', 'tech'）
+            min_weight: 只获取权重不低于该值的平台，低权重平台对流量得分贡献很小
             
         Returns:
             {
@@ -170,30 +306,28 @@ class NewsFlowDataFetcher:
         # 确定要获取的平台列表
         if platforms is None:
             if category:
-                target_platforms = [
-                    p for p, info in self.platforms.items() 
-                    if info.get('category') == category
-                ]
+                target_platforms = list(self._by_category.get(category, []))
             else:
                 target_platforms = list(self.platforms.keys())
         else:
             target_platforms = platforms
         
+        if min_weight > 0:
+            skipped = [p for p in target_platforms
+                       if self.platforms.get(p, {}).get('weight', 5) < min_weight]
+            if skipped:
+                logger.debug(f"跳过权重低于{min_weight}的平台: {', '.join(skipped)}")
+                target_platforms = [p for p in target_platforms if p not in skipped]
+        
+        # 网络I/O为主，并发获取（map保持平台顺序），并发数即限流
         results = []
-        success_count = 0
-        failed_count = 0
+        if target_platforms:
+            max_workers = min(MAX_PARALLEL_FETCHES, len(target_platforms))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self.get_platform_news, target_platforms))
         
-        for platform in target_platforms:
-            result = self.get_platform_news(platform)
-            results.append(result)
-            
-            if result['success']:
-                success_count += 1
-            else:
-                failed_count += 1
-            
-            # 避免请求过快，休息0.3秒
-            time.sleep(0.3)
+        success_count = sum(1 for result in results if result['success'])
+        failed_count = len(results) - success_count
         
         return {
             'success': success_count > 0,
@@ -205,48 +339,23 @@ class NewsFlowDataFetcher:
         }
     
     def extract_stock_related_news(self, platforms_data: List[Dict], 
-                                    keywords: List[str] = None) -> List[Dict]:
+                                    keywords: List[str] = None,
+                                    top_n: Optional[int] = None) -> List[Dict]:
         """
         从新闻数据中提取股票相关的新闻
         
         Args:
             platforms_data: 平台数据列表
             keywords: 股票相关关键词列表
+            top_n: 只返回得分最高的前N条，None表示全部
             
         Returns:
             List[Dict]: 股票相关新闻列表
         """
         if keywords is None:
-            keywords = [
-                # 股市基础词汇
-                '股', '股市', '股票', 'A股', '港股', '美股', '创业板', '科创板', '北交所',
-                '涨停', '跌停', '大涨', '暴涨', '飙升', '暴跌', '涨幅', '跌幅', '翻倍',
-                '概念股', '龙头股', '妖股', '题材股', '白马股', '蓝筹股', '成长股',
-                '上市', 'IPO', '重组', '并购', '收购', '增发', '回购', '减持', '增持',
-                '业绩', '财报', '利好', '利空', '预增', '预减', '盈利', '亏损',
-                '牛市', '熊市', '反弹', '回调', '震荡', '突破', '新高',
-                '主力', '游资', '北向资金', '外资', '机构', '资金流入', '资金流出',
-                '板块', '行业', '赛道', '题材', '轮动', '热点',
-                
-                # 热门板块关键词
-                '芯片', '半导体', '光刻机', '封装', '存储',
-                '新能源', '锂电', '光伏', '储能', '风电', '氢能',
-                'AI', '人工智能', '大模型', 'ChatGPT', 'DeepSeek', '算力', 'GPU',
-                '机器人', '人形机器人', '工业机器人', '减速器', '伺服电机',
-                '低空经济', '无人机', 'eVTOL', '飞行汽车',
-                '数据要素', '数字经济', '信创', '国产替代',
-                '医药', '创新药', 'CXO', '医疗器械', '中药',
-                '消费', '白酒', '食品', '旅游', '免税',
-                '军工', '国防', '航空', '航天', '船舶',
-                '汽车', '新能源车', '智能驾驶', '无人驾驶', '充电桩',
-                '地产', '房地产', '楼市', '房价',
-                '金融', '银行', '保险', '券商', '证券',
-                
-                # 政策相关
-                '政策', '利率', '降息', '降准', '货币政策', '财政政策',
-                '国常会', '证监会', '央行', '发改委', '工信部',
-            ]
+            keywords = self.DEFAULT_STOCK_KEYWORDS
         
+        keyword_pattern = _compile_keywords(tuple(keywords))
         stock_related = []
         
         for platform_data in platforms_data:
@@ -264,9 +373,16 @@ class NewsFlowDataFetcher:
                 content = news.get('content') or ''
                 rank = news.get('rank', 99)
                 
-                # 检查是否包含股票关键词
-                text = f"{title} {content}"
-                matched_keywords = [kw for kw in keywords if kw in text]
+                # 检查是否包含股票关键词：先用正则一次扫描过滤，命中后再统计具体关键词
+                # 标题和正文分别扫描，不拼接字符串；热搜条目通常只有标题
+                if content:
+                    if not (keyword_pattern.search(title) or keyword_pattern.search(content)):
+                        continue
+                    matched_keywords = [kw for kw in keywords if kw in title or kw in content]
+                else:
+                    if not title or not keyword_pattern.search(title):
+                        continue
+                    matched_keywords = [kw for kw in keywords if kw in title]
                 
                 if matched_keywords:
                     # 计算综合得分（排名越靠前、权重越高得分越高）
@@ -292,7 +408,9 @@ class NewsFlowDataFetcher:
                         'score': total_score,
                     })
         
-        # 按综合得分排序
+        # 按综合得分排序（只要前N条时用堆选取，避免全量排序）
+        if top_n is not None:
+            return heapq.nlargest(top_n, stock_related, key=lambda x: x['score'])
         stock_related.sort(key=lambda x: x['score'], reverse=True)
         
         return stock_related
@@ -386,11 +504,10 @@ class NewsFlowDataFetcher:
         Returns:
             List[Dict]: 热门话题列表
         """
-        import jieba
+        jieba = _import_jieba()
         
-        # 收集所有标题及其来源信息
-        all_titles = []
-        title_sources = {}  # 记录每个标题来自哪些平台
+        # 按标题聚合来源平台（同一标题可能出现在多个平台）
+        title_sources = defaultdict(list)
         
         for platform_data in platforms_data:
             if platform_data.get('success'):
@@ -398,32 +515,29 @@ class NewsFlowDataFetcher:
                 for news in platform_data.get('data', []):
                     title = news.get('title') or ''
                     if title:
-                        all_titles.append(title)
-                        if title not in title_sources:
-                            title_sources[title] = []
                         title_sources[title].append(platform_name)
         
-        # 分词并统计
+        # 分词并统计：相同标题只分词一次，按出现次数计数
         word_counter = Counter()
-        word_sources = {}  # 记录每个词出现在哪些平台
-        
-        for title in all_titles:
-            if title:
-                words = jieba.cut(title)
-                for word in words:
-                    if len(word) >= 2 and word not in self.stop_words:
-                        word_counter[word] += 1
-                        if word not in word_sources:
-                            word_sources[word] = set()
-                        for source in title_sources.get(title, []):
-                            word_sources[word].add(source)
+        word_sources = defaultdict(set)  # 记录每个词出现在哪些平台
+        stop_words = self.STOP_WORDS
+        
+        for title, sources in title_sources.items():
+            words = [w for w in jieba.cut(title) if len(w) >= 2 and w not in stop_words]
+            if not words:
+                continue
+            occurrences = len(sources)
+            for word in words:
+                word_counter[word] += occurrences
+            for word in set(words):
+                word_sources[word].update(sources)
         
         # 获取TOP N
         hot_topics = []
-        total_titles = len(all_titles) if all_titles else 1
+        total_titles = sum(len(sources) for sources in title_sources.values()) or 1
         
         for word, count in word_counter.most_common(top_n):
-            sources = list(word_sources.get(word, []))
+            sources = list(word_sources[word])
             cross_platform = len(sources)  # 跨平台数
             heat = min(int(count / total_titles * 1000), 100)
             
@@ -443,12 +557,20 @@ class NewsFlowDataFetcher:
         
         return hot_topics
     
-    def get_platform_ranking(self, platforms_data: List[Dict]) -> List[Dict]:
+    def get_platform_ranking(self, platforms_data: List[Dict],
+                             top_n: Optional[int] = None,
+                             dedup: bool = False) -> List[Dict]:
         """
         获取跨平台热度排名
         
         合并所有平台的新闻，按热度排序
         
+        Args:
+            platforms_data: 平台数据列表
+            top_n: 只返回热度最高的前N条，None表示全部
+            dedup: 是否合并不同平台的同一条新闻（标题去空白后相同），
+                   保留热度最高的一条，并在platforms中列出所有来源
+        
         Returns:
             List[Dict]: 排名列表
         """
@@ -483,8 +605,26 @@ class NewsFlowDataFetcher:
                     'content': news.get('content') or '',
                 })
         
-        # 按热度分数排序
-        all_news.sort(key=lambda x: x['heat_score'], reverse=True)
+        if dedup:
+            merged = {}
+            for news in all_news:
+                key = _WHITESPACE_RE.sub('', news['title'])
+                kept = merged.get(key)
+                if kept is None:
+                    news['platforms'] = [news['platform_name']]
+                    merged[key] = news
+                elif news['heat_score'] > kept['heat_score']:
+                    news['platforms'] = kept['platforms'] + [news['platform_name']]
+                    merged[key] = news
+                else:
+                    kept['platforms'].append(news['platform_name'])
+            all_news = list(merged.values())
+        
+        # 按热度分数排序（只要前N条时用堆选取，避免全量排序）
+        if top_n is not None:
+            all_news = heapq.nlargest(top_n, all_news, key=lambda x: x['heat_score'])
+        else:
+            all_news.sort(key=lambda x: x['heat_score'], reverse=True)
         
         # 添加全局排名
         for i, news in enumerate(all_news):
@@ -570,15 +710,14 @@ class NewsFlowDataFetcher:
             }
         
         # 计算初始得分和增长率
-        initial_score = history_scores[0] if history_scores else 0
-        avg_score = sum(history_scores) / len(history_scores)
+        initial_score = history_scores[0]
         
-        # 计算增长趋势
-        growth_rates = []
-        for i in range(1, len(history_scores)):
-            if history_scores[i-1] > 0:
-                rate = (history_scores[i] - history_scores[i-1]) / history_scores[i-1]
-                growth_rates.append(rate)
+        # 计算增长趋势（相邻两期比较，上期为0时跳过）
+        growth_rates = [
+            (curr - prev) / prev
+            for prev, curr in zip(history_scores, history_scores[1:])
+            if prev > 0
+        ]
         
         avg_growth = sum(growth_rates) / len(growth_rates) if growth_rates else 0
         
@@ -593,7 +732,7 @@ class NewsFlowDataFetcher:
             ]
             time_window = "时间窗口短（2-3天）"
             operation = "快进快出，密切关注热度变化"
-        elif avg_growth > 0.2 and len([r for r in growth_rates if r > 0]) >= 2:
+        elif avg_growth > 0.2 and sum(1 for r in growth_rates if r > 0) >= 2:
             # 持续增长 -> 增量流量型
             flow_type = "增量流量型"
             characteristics = [
@@ -650,13 +789,7 @@ class NewsFlowDataFetcher:
         Returns:
             Dict[str, List[str]]: 类别 -> 平台代码列表
         """
-        categories = {}
-        for code, info in self.platforms.items():
-            category = info['category']
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(code)
-        return categories
+        return {category: list(codes) for category, codes in self._by_category.items()}
 
 
 # 测试代码
@@ -13,6 +13,9 @@ from collections import Counter
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 每保存多少个快照执行一次数据库维护（按30分钟同步约为一天）
+MAINTENANCE_INTERVAL = 48
+
 
 class NewsFlowDatabase:
     """新闻流量数据库管理类"""
@@ -25,6 +28,8 @@ class NewsFlowDatabase:
         """获取数据库连接"""
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
+        # WAL模式下NORMAL已能保证一致性，每次提交无需多次fsync（连接级设置）
+        conn.execute("PRAGMA synchronous=NORMAL")
         return conn
     
     def init_database(self):
@@ -32,6 +37,9 @@ class NewsFlowDatabase:
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # WAL日志模式：读写互不阻塞（设置持久保存在数据库文件中）
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         # 1. 新闻流量快照表（记录每次监测的整体情况）
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS flow_snapshots (
@@ -221,6 +229,31 @@ class NewsFlowDatabase:
         # 数据库迁移：添加缺失的列
         self._migrate_database(cursor)
         
+        # 创建索引（按快照查询明细、按时间倒序查询历史）
+        indexes = [
+            # (索引名, 表名, 列)
+            ('idx_snapshots_created', 'flow_snapshots', 'created_at'),
+            ('idx_snapshots_fetch_time', 'flow_snapshots', 'fetch_time'),
+            ('idx_stock_news_snapshot', 'stock_related_news', 'snapshot_id'),
+            ('idx_stock_news_created', 'stock_related_news', 'created_at'),
+            ('idx_hot_topics_snapshot', 'hot_topics', 'snapshot_id, heat DESC'),
+            ('idx_sentiment_snapshot', 'sentiment_records', 'snapshot_id, created_at'),
+            ('idx_sentiment_created', 'sentiment_records', 'created_at'),
+            ('idx_ai_analysis_snapshot', 'ai_analysis', 'snapshot_id, created_at'),
+            ('idx_ai_analysis_created', 'ai_analysis', 'created_at'),
+            ('idx_alerts_created', 'flow_alerts', 'created_at'),
+            ('idx_scheduler_logs_executed', 'scheduler_logs', 'executed_at'),
+        ]
+        
+        for name, table, columns in indexes:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+        
+        # 部分索引：只包含未通知的预警
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_alerts_unnotified
+        ON flow_alerts(created_at) WHERE is_notified = 0
+        ''')
+        
         conn.commit()
         conn.close()
         logger.info("✅ 新闻流量数据库初始化完成")
@@ -269,6 +302,9 @@ class NewsFlowDatabase:
         cursor = conn.cursor()
         
         try:
+            # 开始即获取写锁，整个快照（含每日统计的读改写）作为一个事务提交
+            cursor.execute("BEGIN IMMEDIATE")
+            
             # 1. 保存快照主表
             cursor.execute('''
             INSERT INTO flow_snapshots 
@@ -290,39 +326,38 @@ class NewsFlowDatabase:
             
             snapshot_id = cursor.lastrowid
             
-            # 2. 保存平台新闻
-            for platform_data in platforms_data:
-                if not platform_data.get('success'):
-                    continue
-                
-                for news in platform_data.get('data', []):
-                    cursor.execute('''
-                    INSERT INTO platform_news
-                    (snapshot_id, platform, platform_name, category, weight,
-                     title, content, url, source, publish_time, rank)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        snapshot_id,
-                        platform_data['platform'],
-                        platform_data['platform_name'],
-                        platform_data['category'],
-                        platform_data['weight'],
-                        news.get('title') or '',
-                        news.get('content') or '',
-                        news.get('url') or '',
-                        news.get('source') or '',
-                        news.get('publish_time') or '',
-                        news.get('rank', 0)
-                    ))
+            # 2. 保存平台新闻（每张表一条语句批量插入）
+            cursor.executemany('''
+            INSERT INTO platform_news
+            (snapshot_id, platform, platform_name, category, weight,
+             title, content, url, source, publish_time, rank)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    snapshot_id,
+                    platform_data['platform'],
+                    platform_data['platform_name'],
+                    platform_data['category'],
+                    platform_data['weight'],
+                    news.get('title') or '',
+                    news.get('content') or '',
+                    news.get('url') or '',
+                    news.get('source') or '',
+                    news.get('publish_time') or '',
+                    news.get('rank', 0)
+                )
+                for platform_data in platforms_data if platform_data.get('success')
+                for news in platform_data.get('data', [])
+            ])
             
             # 3. 保存股票相关新闻
-            for news in stock_news:
-                cursor.execute('''
-                INSERT INTO stock_related_news
-                (snapshot_id, platform, platform_name, category, weight,
-                 title, content, url, source, publish_time, matched_keywords, keyword_count, score)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+            cursor.executemany('''
+            INSERT INTO stock_related_news
+            (snapshot_id, platform, platform_name, category, weight,
+             title, content, url, source, publish_time, matched_keywords, keyword_count, score)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
                     snapshot_id,
                     news['platform'],
                     news['platform_name'],
@@ -336,28 +371,35 @@ class NewsFlowDatabase:
                     json.dumps(news.get('matched_keywords', []), ensure_ascii=False),
                     news.get('keyword_count', 0),
                     news.get('score', 0)
-                ))
+                )
+                for news in stock_news
+            ])
             
             # 4. 保存热门话题
-            for topic in hot_topics:
-                cursor.execute('''
-                INSERT INTO hot_topics
-                (snapshot_id, topic, count, heat, cross_platform, sources)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
+            cursor.executemany('''
+            INSERT INTO hot_topics
+            (snapshot_id, topic, count, heat, cross_platform, sources)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (
                     snapshot_id,
                     topic['topic'],
                     topic['count'],
                     topic['heat'],
                     topic.get('cross_platform', 0),
                     json.dumps(topic.get('sources', []), ensure_ascii=False)
-                ))
+                )
+                for topic in hot_topics
+            ])
             
             # 5. 更新每日统计
             self._update_daily_statistics(cursor, flow_data['total_score'], hot_topics)
             
             conn.commit()
             logger.info(f"✅ 保存流量快照成功，ID: {snapshot_id}")
+            
+            if snapshot_id % MAINTENANCE_INTERVAL == 0:
+                self.run_maintenance()
             return snapshot_id
             
         except Exception as e:
@@ -367,6 +409,22 @@ class NewsFlowDatabase:
         finally:
             conn.close()
     
+    def run_maintenance(self):
+        """数据库维护：更新查询计划统计信息，并把WAL写回主库后截断"""
+        conn = self.get_connection()
+        try:
+            # 新连接上PRAGMA optimize没有查询记录可参考，不会做任何事，
+            # 因此直接ANALYZE；analysis_limit限制每个索引的采样行数，保持开销很小
+            conn.execute("PRAGMA analysis_limit=400")
+            conn.execute("ANALYZE")
+            conn.commit()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            logger.info("✅ 新闻流量数据库维护完成")
+        except Exception as e:
+            logger.warning(f"数据库维护失败: {e}")
+        finally:
+            conn.close()
+    
     def _update_daily_statistics(self, cursor, score: int, hot_topics: List[Dict]):
         """更新每日统计"""
         today = datetime.now().strftime('%Y-%m-%d')
@@ -657,31 +715,46 @@ class NewsFlowDatabase:
     
     def save_alert(self, alert_data: Dict) -> int:
         """保存预警记录"""
+        return self.save_alerts([alert_data])[0]
+    
+    def save_alerts(self, alerts: List[Dict]) -> List[int]:
+        """批量保存预警记录（单个事务提交），返回各条记录ID"""
+        if not alerts:
+            return []
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-        INSERT INTO flow_alerts
-        (alert_type, alert_level, title, content, related_topics,
-         trigger_value, threshold_value, is_notified, snapshot_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            alert_data['alert_type'],
-            alert_data.get('alert_level', 'info'),
-            alert_data['title'],
-            alert_data.get('content', ''),
-            json.dumps(alert_data.get('related_topics', []), ensure_ascii=False),
-            str(alert_data.get('trigger_value', '')),
-            str(alert_data.get('threshold_value', '')),
-            1 if alert_data.get('is_notified') else 0,
-            alert_data.get('snapshot_id')
-        ))
-        
-        alert_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return alert_id
+        try:
+            alert_ids = []
+            for alert_data in alerts:
+                cursor.execute('''
+                INSERT INTO flow_alerts
+                (alert_type, alert_level, title, content, related_topics,
+                 trigger_value, threshold_value, is_notified, snapshot_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    alert_data['alert_type'],
+                    alert_data.get('alert_level', 'info'),
+                    alert_data['title'],
+                    alert_data.get('content', ''),
+                    json.dumps(alert_data.get('related_topics', []), ensure_ascii=False),
+                    str(alert_data.get('trigger_value', '')),
+                    str(alert_data.get('threshold_value', '')),
+                    1 if alert_data.get('is_notified') else 0,
+                    alert_data.get('snapshot_id')
+                ))
+                alert_ids.append(cursor.lastrowid)
+            
+            conn.commit()
+            return alert_ids
+            
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ 保存预警记录失败: {e}")
+            raise
+        finally:
+            conn.close()
     
     def get_alerts(self, days: int = 7, alert_type: str = None) -> List[Dict]:
         """获取预警记录"""
@@ -712,6 +785,24 @@ class NewsFlowDatabase:
         conn.close()
         return alerts
     
+    def get_alert_counts(self, days: int = 7) -> List[Dict]:
+        """按预警类型和级别统计预警数量"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        
+        cursor.execute('''
+        SELECT alert_type, alert_level, COUNT(*) AS count
+        FROM flow_alerts
+        WHERE created_at >= ?
+        GROUP BY alert_type, alert_level
+        ''', (since,))
+        
+        counts = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return counts
+    
     def get_unnotified_alerts(self) -> List[Dict]:
         """获取未通知的预警"""
         conn = self.get_connection()
@@ -744,6 +835,22 @@ class NewsFlowDatabase:
         conn.commit()
         conn.close()
     
+    def mark_alerts_notified(self, alert_ids: List[int]):
+        """批量标记预警为已通知"""
+        if not alert_ids:
+            return
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' * len(alert_ids))
+        cursor.execute(f'''
+        UPDATE flow_alerts SET is_notified = 1 WHERE id IN ({placeholders})
+        ''', list(alert_ids))
+        
+        conn.commit()
+        conn.close()
+    
     # ==================== AI分析相关方法 ====================
     
     def save_ai_analysis(self, snapshot_id: int, analysis_data: Dict) -> int:
@@ -801,12 +908,15 @@ class NewsFlowDatabase:
         return None
     
     def get_ai_analysis_history(self, limit: int = 20) -> List[Dict]:
-        """获取AI分析历史"""
+        """获取AI分析历史（列表不含raw_response原始回复，需要时用get_latest_ai_analysis）"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-        SELECT aa.*, fs.fetch_time, fs.total_score, fs.flow_level
+        SELECT aa.id, aa.snapshot_id, aa.affected_sectors, aa.recommended_stocks,
+               aa.risk_level, aa.risk_factors, aa.advice, aa.confidence, aa.summary,
+               aa.model_used, aa.analysis_time, aa.created_at,
+               fs.fetch_time, fs.total_score, fs.flow_level
         FROM ai_analysis aa
         LEFT JOIN flow_snapshots fs ON aa.snapshot_id = fs.id
         ORDER BY aa.created_at DESC
@@ -222,7 +222,7 @@ class NewsFlowScheduler:
                 
                 # 发送通知
                 if alert_count > 0 and self.alert_system:
-                    self.alert_system.send_notification(result['alerts'])
+                    self.alert_system.send_notification_async(result['alerts'])
             else:
                 message = result.get('error', '未知错误')
                 self._log_task(task_name, task_type, 'failed', message, duration)
@@ -3,11 +3,15 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import json
 import os
+from collections import deque
 from typing import Dict, List
 import streamlit as st
 
 from monitor_db import monitor_db
 
+# 界面通知最多保留条数，超出后自动丢弃最早的通知
+MAX_STREAMLIT_NOTIFICATIONS = 100
+
 class NotificationService:
     """通知服务"""
     
@@ -172,7 +176,7 @@ class NotificationService:
         """在Streamlit界面显示通知"""
         # 使用session_state存储通知
         if 'notifications' not in st.session_state:
-            st.session_state.notifications = []
+            st.session_state.notifications = deque(maxlen=MAX_STREAMLIT_NOTIFICATIONS)
         
         # 避免重复通知，使用symbol代替stock_id
         notification_key = f"{notification['symbol']}_{notification['type']}_{notification['triggered_at']}"
@@ -188,12 +192,12 @@ class NotificationService:
     
     def get_streamlit_notifications(self) -> List[Dict]:
         """获取Streamlit界面通知"""
-        return st.session_state.get('notifications', [])
+        return list(st.session_state.get('notifications', []))
     
     def clear_streamlit_notifications(self):
         """清空Streamlit界面通知"""
         if 'notifications' in st.session_state:
-            st.session_state.notifications = []
+            st.session_state.notifications = deque(maxlen=MAX_STREAMLIT_NOTIFICATIONS)
     
     def test_email_config(self) -> bool:
         """测试邮件配置"""